@@ -0,0 +1,136 @@
+"""
+    Columnar per-packet traces for the switch simulations.
+
+    A trace is a directory holding one raw binary file per column plus
+    columns.json describing their dtypes. TraceWriter fills preallocated
+    NumPy chunks and a background thread appends full chunks to the
+    column files; read_trace maps the columns back with np.memmap, so
+    a trace larger than RAM can still be sliced and reduced.
+"""
+import os
+import json
+import queue
+import threading
+
+import numpy as np
+
+COLUMNS = (('id', 'i8'), ('src', 'i4'), ('dst', 'i4'), ('gen_time', 'f8'), ('sink_time', 'f8'),
+           ('contention_delay', 'f8'), ('lookup_wait', 'f8'))
+SCHEMA = 'columns.json'
+WAIT_TIMEOUT = 1.0  # seconds between checks on the writer thread while waiting for a free chunk
+
+
+class TraceWriter(object):
+    """ Records delivered packets into a columnar trace directory.
+        Give it to a PacketSink as trace= and call close() after env.run
+        to write the last partial chunk.
+
+        Parameters
+        ----------
+        path : str
+            the trace directory, created if needed; existing columns are overwritten
+        chunk_size : int
+            packets per chunk handed to the writer thread
+        chunks : int
+            number of preallocated chunks; record() waits for a free one
+            when the writer thread falls this far behind
+
+        If the writer thread fails (e.g. the disk is full), its exception
+        is raised again from the next record(), flush() or close() as the
+        cause of a RuntimeError.
+    """
+    def __init__(self, path, chunk_size=1 << 16, chunks=3):
+        self.path = path
+        self.chunk_size = chunk_size
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, SCHEMA), 'w') as f:
+            json.dump(dict(COLUMNS), f)
+        self.files = {name: open(os.path.join(path, name + '.bin'), 'wb') for name, _ in COLUMNS}
+
+        self.free = queue.Queue()
+        for _ in range(chunks):
+            self.free.put({name: np.empty(chunk_size, dtype=dtype) for name, dtype in COLUMNS})
+        self.full = queue.Queue()
+        self.chunk = self.free.get()
+        self.n = 0
+        self.packets = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def record(self, pkt, now):
+        chunk, i = self.chunk, self.n
+        chunk['id'][i] = pkt.id
+        chunk['src'][i] = -1 if pkt.portID is None else pkt.portID
+        chunk['dst'][i] = pkt.dst
+        chunk['gen_time'][i] = pkt.time
+        chunk['sink_time'][i] = now
+        chunk['contention_delay'][i] = pkt.contentionDelay
+        # time queued at input ports before their lookups, over all switches; lookupwaitdelay, the wait
+        # for the lookup table itself, is always 0 because each port's table has only that port as requester
+        chunk['lookup_wait'][i] = pkt.lookupwaitsum
+        self.n += 1
+        self.packets += 1
+        if self.n == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """ Hands the current chunk to the writer thread. """
+        if self.n:
+            self._check_writer()
+            self.full.put((self.chunk, self.n))
+            self.chunk = self._free_chunk()
+            self.n = 0
+
+    def close(self):
+        try:
+            self.flush()
+            self.full.put(None)
+            self.thread.join()
+            self._raise_error()
+        finally:
+            for f in self.files.values():
+                f.close()
+
+    def _free_chunk(self):
+        # a dead writer never hands chunks back, so don't wait on it forever
+        while True:
+            try:
+                return self.free.get(timeout=WAIT_TIMEOUT)
+            except queue.Empty:
+                self._check_writer()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError('trace writer for {} failed'.format(self.path)) from self.error
+
+    def _check_writer(self):
+        self._raise_error()
+        if not self.thread.is_alive():
+            raise RuntimeError('trace writer for {} has stopped'.format(self.path))
+
+    def _run(self):
+        try:
+            while True:
+                item = self.full.get()
+                if item is None:
+                    return
+                chunk, n = item
+                for name, column in chunk.items():
+                    self.files[name].write(column[:n].tobytes())
+                self.free.put(chunk)
+        except Exception as e:
+            self.error = e
+
+
+def read_trace(path):
+    """ Maps a trace directory as {column: np.memmap}. Columns are cut to
+        the shortest one, so a trace still being written reads consistently.
+    """
+    with open(os.path.join(path, SCHEMA)) as f:
+        schema = json.load(f)
+    files = {name: os.path.join(path, name + '.bin') for name in schema}
+    length = min(os.path.getsize(files[name]) // np.dtype(dtype).itemsize for name, dtype in schema.items())
+    if length == 0:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in schema.items()}
+    return {name: np.memmap(files[name], dtype=dtype, mode='r', shape=(length,)) for name, dtype in schema.items()}
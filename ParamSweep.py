@@ -0,0 +1,70 @@
+"""
+    Parallel parameter sweeps over the QueueNet2 switch fabric.
+
+    Every grid point is built with build_switch_fabric and run in a
+    process pool, then reduced to one row of summary metrics. Fabrics
+    carry their own parameters and RNG, so a worker runs point after
+    point without re-importing anything.
+"""
+import csv
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from SwitchFabric import FabricConfig, build_switch_fabric
+
+DEFAULT_GRID = {
+    'gen_rate': [1 * 10 ** 9, 5 * 10 ** 9, 9 * 10 ** 9],
+    'qlimit_voq': [1 * (2 ** 20)],
+    'qlimit_edgeports': [10 * (2 ** 20)],
+    'numOfInputPorts': [8, 32],
+    'num_of_switches': [2],
+    'seed': [0, 1],
+}
+
+
+def grid(axes):
+    """ Every combination of the axes' values, as one dict per point. """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+
+def run_point(point, sim_time=None):
+    """ Builds and runs the fabric at one grid point and returns its summary row. """
+    overrides = {name: value for name, value in point.items() if name != 'seed'}
+    if sim_time is not None:
+        overrides['sim_time'] = sim_time
+    start = time.perf_counter()
+    fabric = build_switch_fabric(FabricConfig(seed=point.get('seed'), **overrides)).run()
+    return dict(point, **fabric.summary(), seconds=time.perf_counter() - start)
+
+
+def sweep(axes, workers=None, sim_time=None):
+    """ Runs every point of the grid in a process pool (or in this process
+        when workers is 0); rows come back in grid order.
+    """
+    points = grid(axes)
+    if workers == 0:
+        return [run_point(point, sim_time) for point in points]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_point, points, itertools.repeat(sim_time)))
+
+
+def write_csv(rows, file_name):
+    with open(file_name, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    start = time.perf_counter()
+    rows = sweep(DEFAULT_GRID)
+    write_csv(rows, 'sweep.csv')
+    for row in rows:
+        print(', '.join('{}={:.4g}'.format(name, value) if isinstance(value, float) else '{}={}'.format(name, value)
+                        for name, value in row.items()))
+    print('{} points in {:.1f} s ({:.1f} s of scenario time)'.format(
+        len(rows), time.perf_counter() - start, sum(row['seconds'] for row in rows)))
+
+if __name__ == '__main__':
+    main()
@@ -10,4 +10,6 @@ numOfVOQsPerPort = numOfOutputPorts
 num_gen = numOfInputPorts
 gen_rate = 1* 10**9
 lk_delay =  6.5 *23* 10**-9
-num_of_switches = 2
\ No newline at end of file
+num_of_switches = 2
+packet_pool = True # recycle Packet objects through a SimComponents.PacketPool
+trace_path = None # directory for a per-packet PacketTrace, or None for no trace
\ No newline at end of file
@@ -4,10 +4,11 @@
     Copyright 2014 Greg M. Bernstein
     Released under the MIT license
 """
+import math
 import random
+from collections import defaultdict
 
 import simpy
-from Params import port_rate, numOfVOQsPerPort, numOfOutputPorts, lk_delay
 from simpy.core import BoundClass
 from simpy.resources import base
 from heapq import heappush, heappop
@@ -19,6 +20,10 @@ class Packet(object):
         We use a float to represent the size of the packet in bytes so that
         we can compare to ideal M/M/1 queues.
 
+        Packets are slotted: every field a component stamps on them on the
+        way through (lookupwait and lookupwaitsum at a Port, delay2 at a VOQ) is declared
+        here, so a packet carries no per-instance dict.
+
         Parameters
         ----------
         time : float
@@ -31,8 +36,13 @@ class Packet(object):
             identifiers for source and destination
         flow_id : int
             small integer that can be used to identify a flow
+        pool : PacketPool
+            the pool to hand the packet back to on release(), if any
     """
-    def __init__(self, time, size, id, src, dst, flow_id=0, portID=None, contentionDelay=0, lookupwaitdelay =0):
+    __slots__ = ('time', 'size', 'id', 'src', 'dst', 'flow_id', 'portID', 'contentionDelay',
+                 'lookupwaitdelay', 'frontpackets', 'lookupwait', 'lookupwaitsum', 'delay2', 'pool')
+
+    def __init__(self, time, size, id, src, dst, flow_id=0, portID=None, contentionDelay=0, lookupwaitdelay =0, pool=None):
         self.time = time
         self.size = size
         self.id = id
@@ -43,11 +53,46 @@ class Packet(object):
         self.contentionDelay = contentionDelay
         self.lookupwaitdelay = lookupwaitdelay
         self.frontpackets = 0
+        self.lookupwait = 0  # arrival time at a Port, then the wait before lookup
+        self.lookupwaitsum = 0  # lookupwait summed over every Port on the way
+        self.delay2 = 0  # transmission delay of the bytes ahead of it in its VOQ
+        self.pool = pool
+
+    def release(self):
+        """ Hands the packet back to its pool once nothing refers to it any more. """
+        if self.pool is not None:
+            self.pool.release(self)
 
     def __repr__(self):
         return "time: {}, id: {}, src: {}, dst: {}, size: {}".\
             format(self.time, self.id, self.portID, self.dst, self.size)
 
+class PacketPool(object):
+    """ Recycles Packet objects so a long run doesn't allocate one per packet.
+        get() takes the same arguments as Packet() and reuses a released
+        packet when there is one. Packets go back to the pool when they are
+        dropped at a Port or VOQ and after a PacketSink has recorded them.
+
+        Parameters
+        ----------
+        size : int
+            number of packets to allocate up front
+    """
+    def __init__(self, size=0):
+        self.free = [Packet(0, 0, 0, None, None, pool=self) for _ in range(size)]
+        self.allocated = size
+
+    def get(self, time, size, id, src, dst, flow_id=0, portID=None):
+        if self.free:
+            pkt = self.free.pop()
+            pkt.__init__(time, size, id, src, dst, flow_id, portID, pool=self)
+            return pkt
+        self.allocated += 1
+        return Packet(time, size, id, src, dst, flow_id, portID, pool=self)
+
+    def release(self, pkt):
+        self.free.append(pkt)
+
 class PacketGenerator(object):
     """ Generates packets with given inter-arrival time distribution.
         Set the "out" member variable to the entity to receive the packet.
@@ -64,10 +109,16 @@ class PacketGenerator(object):
             Starts generation after an initial delay. Default = 0
         finish : number
             Stops generation at the finish time. Default is infinite
+        pool : PacketPool
+            if given, packets are taken from this pool instead of allocated
+        num_dsts : int
+            destinations are drawn uniformly from range(num_dsts) (keyword only, required)
+        rng : random.Random
+            source of the destinations. Default is the random module
 
 
     """
-    def __init__(self, env, id,  adist, sdist,active, initial_delay=0, finish=float("inf"), flow_id=0, portID=None):
+    def __init__(self, env, id,  adist, sdist,active, initial_delay=0, finish=float("inf"), flow_id=0, portID=None, pool=None, rng=None, *, num_dsts):
         self.id = id
         self.env = env
         self.adist = adist
@@ -82,6 +133,9 @@ class PacketGenerator(object):
         self.start1time= env.now
         self.active = active
         self.portID = portID
+        self.pool = pool
+        self.num_dsts = num_dsts
+        self.rng = rng if rng is not None else random
 
     def run(self):
         """The generator function used in simulations.
@@ -93,17 +147,117 @@ class PacketGenerator(object):
                 self.packets_sent += 1
 #                 src= random.randrange(0,16,1)
 
-                dst = random.randrange(0,numOfOutputPorts)
+                dst = self.rng.randrange(0,self.num_dsts)
 #                 dst=0
 #                p = Packet(self.env.now, self.sdist, self.packets_sent, src=self.id, dst=dst,  flow_id=self.flow_id)
-                p = Packet(self.env.now, self.sdist, self.packets_sent, src=self.id, dst=dst,  flow_id=self.flow_id, portID=self.portID)
+                if self.pool is None:
+                    p = Packet(self.env.now, self.sdist, self.packets_sent, src=self.id, dst=dst,  flow_id=self.flow_id, portID=self.portID)
+                else:
+                    p = self.pool.get(self.env.now, self.sdist, self.packets_sent, src=self.id, dst=dst,  flow_id=self.flow_id, portID=self.portID)
                 #print(p)
                 self.bytes_sent+= p.size
                 self.out.put(p)
 
+class QuantileSketch(object):
+    """ Streaming quantile estimates in bounded memory (a DDSketch-style
+        log-bucketed histogram). A positive value x is counted in bucket
+        ceil(log_gamma(x)); every quantile is then within relative_accuracy
+        of the exact one, and the number of buckets only grows with the
+        log of the range of the values, not with how many are added.
+        Zero and negative values are counted as zero.
+
+        Parameters
+        ----------
+        relative_accuracy : float
+            bound on the relative error of the reported quantiles
+    """
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, x):
+        self.count += 1
+        if x <= 0:
+            self.zeros += 1
+            return
+        i = math.ceil(math.log(x) / self.log_gamma)
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+
+    def quantile(self, q):
+        if self.count == 0:
+            return float('nan')
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen > rank:
+                # midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                return 2 * self.gamma ** i / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+class RunningStats(object):
+    """ Count, mean, variance (Welford's method), min, max and a
+        QuantileSketch of a stream of values, in constant memory.
+
+        Parameters
+        ----------
+        relative_accuracy : float
+            accuracy of the quantile sketch
+    """
+    QUANTILES = (('p50', 0.5), ('p99', 0.99), ('p99.9', 0.999))
+
+    def __init__(self, relative_accuracy=0.01):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        self.sketch.add(x)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def summary(self):
+        summary = {'count': self.count, 'mean': self.mean if self.count else float('nan'), 'std': self.std,
+                   'min': self.min, 'max': self.max}
+        for name, q in self.QUANTILES:
+            summary[name] = self.quantile(q)
+        return summary
+
 class PacketSink(object):
-    """ Receives packets and collects delay information into the
-        waits list. You can then use this list to look at delay statistics.
+    """ Receives packets and collects delay statistics.
+
+        Port to port latency, input buffer wait and VOQ contention wait are
+        kept as RunningStats (mean, variance, min, max and P50/P99/P99.9)
+        in wait_stats, queue_stats and contention_stats, with latency also
+        broken down per flow (flow_stats) and per input port (port_stats),
+        so memory stays constant however long the simulation runs. The raw
+        per-packet waits, qWaits, cWaits and fronpackets lists are only
+        filled with rec_waits.
 
         Parameters
         ----------
@@ -118,11 +272,20 @@ class PacketSink(object):
             is recorded.
         rec_waits : boolean
             if true waiting time experienced by each packet is recorded
+        relative_accuracy : float
+            accuracy of the latency quantiles
+        trace : PacketTrace.TraceWriter
+            if given, every delivered packet is also recorded in this trace
+        port_rate : float
+            the port bit rate, to take the transmission delay out of the input buffer wait
+            (keyword only, required)
+        lk_delay : float
+            the table lookup delay, likewise (keyword only, required)
         selector: a function that takes a packet and returns a boolean
             used for selective statistics. Default none.
 
     """
-    def __init__(self, env, rec_arrivals=False, absolute_arrivals=False, rec_waits=True, debug=False):
+    def __init__(self, env, rec_arrivals=False, absolute_arrivals=False, rec_waits=False, debug=False, relative_accuracy=0.01, trace=None, *, port_rate, lk_delay):
         self.store = simpy.Store(env)
         self.env = env
         self.rec_waits = rec_waits
@@ -132,7 +295,15 @@ class PacketSink(object):
         self.qWaits = []
         self.cWaits = []
         self.arrivals = []
+        self.wait_stats = RunningStats(relative_accuracy)
+        self.queue_stats = RunningStats(relative_accuracy)
+        self.contention_stats = RunningStats(relative_accuracy)
+        self.flow_stats = defaultdict(lambda: RunningStats(relative_accuracy))
+        self.port_stats = defaultdict(lambda: RunningStats(relative_accuracy))
         self.debug = debug
+        self.trace = trace
+        self.port_rate = port_rate
+        self.lk_delay = lk_delay
         self.action = env.process(self.run())  # starts the run() method as a SimPy process
         self.packets_rec = 0
         self.bytes_rec = 0
@@ -143,23 +314,29 @@ class PacketSink(object):
             msg = yield self.store.get()
             self.packets_rec += 1
             self.bytes_rec += msg.size
-            self.fronpackets.append(msg.frontpackets)
+            endTime = self.env.now
+            genTime = msg.time
+            wait = endTime - genTime
+            transDelay = msg.size * 8.0 / self.port_rate
+            contentionDelay = msg.contentionDelay
+            queueWait = max(endTime - genTime - transDelay - self.lk_delay - contentionDelay, 0)
+
+            self.wait_stats.add(wait)
+            self.queue_stats.add(queueWait)
+            self.contention_stats.add(contentionDelay)
+            self.flow_stats[msg.flow_id].add(wait)
+            self.port_stats[msg.portID].add(wait)
             if self.rec_waits:
-                self.waits.append(self.env.now - msg.time)
-                #print (self.env.now - msg.time)
-                endTime = self.env.now
-                genTime = msg.time
-                transDelay = msg.size * 8.0 / port_rate
-                contentionDelay = msg.contentionDelay
+                self.fronpackets.append(msg.frontpackets)
+                self.waits.append(wait)
                 self.cWaits.append(contentionDelay)
-                #print msg.lookupwaitdelay
-                if endTime - genTime - transDelay - lk_delay - contentionDelay < 0:
-                    self.qWaits.append(0)
-                else:
-                    self.qWaits.append(endTime - genTime - transDelay - lk_delay - contentionDelay)
+                self.qWaits.append(queueWait)
+            if self.trace is not None:
+                self.trace.record(msg, endTime)
 
             if self.debug:
                 print(msg)
+            msg.release()
     
     def put(self, pkt):
         self.store.put(pkt)
@@ -226,6 +403,7 @@ class VOQ(object):
             return self.store.put(pkt)
         if tmp >= self.qlimit:
             self.packets_drop += 1
+            pkt.release()
             return
         else:
             self.byte_size = tmp
@@ -246,13 +424,19 @@ class Port(object):
             the bit rate of the port
         qlimit : integer (or None)
             a buffer size limit in bytes for the queue (does not include items in service).
+        lookuptable : simpy.Resource
+            the forwarding table, one lookup at a time
+        num_voqs : int
+            number of VOQs in outs, indexed by packet dst (keyword only, required)
+        lk_delay : float
+            time one table lookup takes (keyword only, required)
 
     """
-    def __init__(self, env, rate, qlimit, debug=False, lookuptable=None):
+    def __init__(self, env, rate, qlimit, debug=False, lookuptable=None, *, num_voqs, lk_delay):
         self.store = simpy.Store(env)
         self.rate = rate
         self.env = env
-        self.outs = [None for _ in range(numOfVOQsPerPort)]
+        self.outs = [None for _ in range(num_voqs)]
         self.packets_rec = 0
         self.packets_drop = 0
         self.qlimit = qlimit
@@ -270,6 +454,7 @@ class Port(object):
         while True:
             msg = yield self.store.get()
             msg.lookupwait = self.env.now - msg.lookupwait
+            msg.lookupwaitsum += msg.lookupwait
             self.busy = 1
             self.byte_size -= msg.size
             with self.lookuptable.request() as req:
@@ -291,6 +476,7 @@ class Port(object):
             return self.store.put(pkt)
         if tmp >= self.qlimit:
             self.packets_drop += 1
+            pkt.release()
             return
         else:
             self.byte_size = tmp
@@ -462,11 +648,13 @@ class WFQScheduler(object):
         phis : A list
             list of the phis parameters (for each possible packet flow_id). We assume a simple assignment of
             flow id to phis, i.e., flow_id = 0 corresponds to phis[0], etc...
+        num_outputs : int
+            number of output ports to keep finish times for (keyword only, required)
     """
-    def __init__(self, env, switching_rate, debug=False):
+    def __init__(self, env, switching_rate, debug=False, *, num_outputs):
         self.env = env
         self.rate = switching_rate
-        self.F_times = [0.0 for i in range(numOfOutputPorts)]  # Initialize all the finish time variables
+        self.F_times = [0.0 for i in range(num_outputs)]  # Initialize all the finish time variables
         # We keep track of the number of packets from each flow in the queue
         #self.flow_queue_count = [0 for i in range(len(phis))]
         self.active_set = set()
@@ -0,0 +1,118 @@
+"""
+    Builds the multi-switch VOQ fabric of the QueueNet2 experiments as a
+    self-contained object, so differently sized fabrics can be built and
+    run side by side in one process.
+"""
+import random
+import functools
+
+import simpy
+from simpy.resources.resource import Resource
+
+import Params
+from SimComponents import PacketGenerator, PacketSink, VOQ, Port, SinkMonitor, PacketPool
+from PacketTrace import TraceWriter
+
+CONFIG_FIELDS = ('mean_pkt_size', 'qlimit_edgeports', 'qlimit_voq', 'sim_time', 'port_rate', 'numOfInputPorts',
+                 'gen_rate', 'lk_delay', 'num_of_switches', 'packet_pool', 'trace_path')
+
+
+class FabricConfig(object):
+    """ Parameters of one fabric. Anything not given is taken from Params
+        as it is when the config is built. numOfOutputPorts,
+        numOfVOQsPerPort and num_gen (the number of active generators)
+        follow numOfInputPorts unless given.
+
+        Parameters
+        ----------
+        seed : int
+            seed of the fabric's own random.Random; None seeds from the OS
+    """
+    def __init__(self, seed=None, **overrides):
+        unknown = set(overrides) - set(CONFIG_FIELDS) - {'numOfOutputPorts', 'numOfVOQsPerPort', 'num_gen'}
+        if unknown:
+            raise TypeError('unknown fabric parameters: {}'.format(', '.join(sorted(unknown))))
+        for name in CONFIG_FIELDS:
+            setattr(self, name, overrides.get(name, getattr(Params, name)))
+        self.numOfOutputPorts = overrides.get('numOfOutputPorts', self.numOfInputPorts)
+        self.numOfVOQsPerPort = overrides.get('numOfVOQsPerPort', self.numOfOutputPorts)
+        self.num_gen = overrides.get('num_gen', self.numOfInputPorts)
+        self.seed = seed
+
+    def __repr__(self):
+        return 'FabricConfig({})'.format(', '.join('{}={!r}'.format(name, value) for name, value in vars(self).items()))
+
+
+class SwitchFabric(object):
+    """ num_of_switches switches in series, each with numOfInputPorts input
+        ports feeding numOfVOQsPerPort VOQs that contend for the switch's
+        output ports. Packet generators feed the first switch; a packet
+        leaving switch s through output port d enters switch s + 1 on
+        input port d, and the last switch delivers to the sink ps.
+        Build one with build_switch_fabric.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.env = env = simpy.Environment()
+        switches, ports, voqs = config.num_of_switches, config.numOfInputPorts, config.numOfVOQsPerPort
+
+        self.pool = PacketPool() if config.packet_pool else None
+        self.trace = TraceWriter(config.trace_path) if config.trace_path else None
+        self.ps = PacketSink(env, debug=False, trace=self.trace, port_rate=config.port_rate, lk_delay=config.lk_delay)
+        self.pm = SinkMonitor(env, self.ps, 1)
+
+        self.outputPorts = [[Resource(env, capacity=1) for _ in range(config.numOfOutputPorts)] for _ in range(switches)]
+        self.lookuptable = [[Resource(env, capacity=1) for _ in range(ports)] for _ in range(switches)]
+        self.inputPorts = [[Port(env, config.port_rate, config.qlimit_edgeports, lookuptable=self.lookuptable[s][i],
+                                 num_voqs=voqs, lk_delay=config.lk_delay)
+                            for i in range(ports)] for s in range(switches)]
+
+        adist = functools.partial(self.rng.expovariate, config.gen_rate / (config.mean_pkt_size * 8))
+        self.pg = [PacketGenerator(env, "SJSU1", adist, config.mean_pkt_size, i < config.num_gen, portID=i,
+                                   pool=self.pool, num_dsts=config.numOfOutputPorts, rng=self.rng)
+                   for i in range(ports)]
+        for i, gen in enumerate(self.pg):
+            gen.out = self.inputPorts[0][i]
+
+        self.voq = [[[None] * voqs for _ in range(ports)] for _ in range(switches)]
+        for s in range(switches):
+            for i in range(ports):
+                for v in range(voqs):
+                    queue = VOQ(env, config.port_rate, config.qlimit_voq, switch_id=s, outputPorts=self.outputPorts, inputport_id=i)
+                    queue.out = self.inputPorts[s + 1][v] if s + 1 < switches else self.ps
+                    self.inputPorts[s][i].outs[v] = queue
+                    self.voq[s][i][v] = queue
+
+    def run(self, until=None):
+        """ Runs the simulation to until (default: the config's sim_time) and closes the trace. """
+        until = self.config.sim_time if until is None else until
+        self.env.run(until=until)
+        if self.trace is not None:
+            self.trace.close()
+        return self
+
+    def summary(self):
+        """ Packet counts, drops, throughput and delay statistics of the run so far as a dict. """
+        ps = self.ps
+        ports = [port for switch in self.inputPorts for port in switch]
+        voqs = [queue for switch in self.voq for port in switch for queue in port]
+        return dict(generated=sum(gen.packets_sent for gen in self.pg),
+                    port_received=sum(port.packets_rec for port in ports),
+                    port_drops=sum(port.packets_drop for port in ports),
+                    voq_received=sum(queue.packets_rec for queue in voqs),
+                    voq_drops=sum(queue.packets_drop for queue in voqs),
+                    delivered=ps.packets_rec,
+                    throughput=ps.bytes_rec * 8 / self.env.now if self.env.now else 0.0,
+                    latency_mean=ps.wait_stats.mean,
+                    latency_p50=ps.wait_stats.quantile(0.5),
+                    latency_p99=ps.wait_stats.quantile(0.99),
+                    latency_p999=ps.wait_stats.quantile(0.999),
+                    latency_max=ps.wait_stats.max,
+                    contention_mean=ps.contention_stats.mean,
+                    queue_wait_mean=ps.queue_stats.mean)
+
+
+def build_switch_fabric(config=None):
+    """ Builds a SwitchFabric from config (default: FabricConfig() from Params). """
+    return SwitchFabric(config if config is not None else FabricConfig())
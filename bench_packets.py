@@ -0,0 +1,59 @@
+import time
+import tracemalloc
+import Params
+import SimComponents
+from SwitchFabric import FabricConfig, build_switch_fabric
+
+# (offered load per input port in bit/s, simulated seconds): nominal, and overloaded so queues fill up
+LOADS = [(1 * 10 ** 9, 0.005), (15 * 10 ** 9, 0.001)]
+REPEATS = 3
+
+
+class LegacyPacket(object):
+    # the original dict-backed packet; Port and VOQ add lookupwait and delay2 per hop
+    def __init__(self, time, size, id, src, dst, flow_id=0, portID=None, contentionDelay=0, lookupwaitdelay=0):
+        self.time = time
+        self.size = size
+        self.id = id
+        self.src = src
+        self.dst = dst
+        self.flow_id = flow_id
+        self.portID = portID
+        self.contentionDelay = contentionDelay
+        self.lookupwaitdelay = lookupwaitdelay
+        self.frontpackets = 0
+        self.lookupwaitsum = 0
+
+    def release(self):
+        pass
+
+
+def run(packet, pool, gen_rate, sim_time, trace=False):
+    '''Builds and runs the fabric once; returns (seconds, peak traced bytes, packets at the sink)'''
+    SimComponents.Packet = packet
+    config = FabricConfig(seed=0, packet_pool=pool, gen_rate=gen_rate, sim_time=sim_time)
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    fabric = build_switch_fabric(config).run()
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak, fabric.ps.packets_rec
+
+
+def main():
+    slotted = SimComponents.Packet
+    variants = [('dict packet', LegacyPacket, False), ('slotted packet', slotted, False), ('slotted + pool', slotted, True)]
+    for gen_rate, sim_time in LOADS:
+        print(f'QueueNet2 fabric: {Params.numOfInputPorts} ports, {gen_rate / 1e9:g} Gb/s offered per port, sim_time={sim_time}s')
+        for name, packet, pool in variants:
+            seconds = min(run(packet, pool, gen_rate, sim_time)[0] for _ in range(REPEATS))
+            _, peak, received = run(packet, pool, gen_rate, sim_time, trace=True)
+            print(f'  {name:16s} {seconds:6.2f} s  peak {peak / 2 ** 20:7.1f} MB  {received} packets delivered')
+    SimComponents.Packet = slotted
+
+if __name__ == '__main__':
+    main()
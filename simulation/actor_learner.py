@@ -0,0 +1,154 @@
+import os
+import time
+import random
+import numpy as np
+import networkx as nx
+import torch
+import torch.multiprocessing as mp
+from game import Game
+from fatTree import dc_topology
+from rlModel import Linear_QNet, InferencePolicy
+from agent import Agent, NUM_ACTIONS
+
+QUEUE_CAPACITY = 10_000
+SYNC_INTERVAL = 10  # learner updates between weight pushes to the actors
+
+
+class TransitionQueue:
+    '''Single-producer ring of transitions living in shared memory
+
+    An actor writes rows of (state, action, reward, next_state, done,
+    next_mask) and bumps the shared write counter; the learner drains
+    everything written since its last read. If the learner falls more than
+    a full ring behind, the oldest unread rows are overwritten and skipped.
+    '''
+
+    def __init__(self, capacity, state_size, num_actions, ctx):
+        self.capacity = capacity
+        self.state_size = state_size
+        self.rows = torch.zeros((capacity, 2 * state_size + 3 + num_actions)).share_memory_()
+        self.written = ctx.Value('q', 0)
+        self.read = 0  # learner-side cursor
+
+    def put(self, state, action, reward, next_state, done, next_mask):
+        s = self.state_size
+        row = self.rows.numpy()[self.written.value % self.capacity]
+        row[:s] = state
+        row[s] = action
+        row[s + 1] = reward
+        row[s + 2:2 * s + 2] = next_state
+        row[2 * s + 2] = done
+        row[2 * s + 3:] = next_mask
+        with self.written.get_lock():
+            self.written.value += 1
+
+    def drain(self):
+        written = self.written.value
+        start = max(self.read, written - self.capacity)
+        self.read = written
+        if start == written:
+            return None
+
+        s = self.state_size
+        rows = self.rows.numpy()[np.arange(start, written) % self.capacity]
+        return (rows[:, :s], rows[:, s].astype(np.int64), rows[:, s + 1],
+                rows[:, s + 2:2 * s + 2], rows[:, 2 * s + 2].astype(bool), rows[:, 2 * s + 3:].astype(bool))
+
+
+def run_actor(k, shared_model, version, queue, stop, seed):
+    '''Plays headless hop-mode episodes with a local copy of the learner's weights'''
+    torch.set_num_threads(1)
+    random.seed(seed)
+
+    network = nx.Graph()
+    dc_topology(network, k)
+    game = Game(network, hop=True)
+
+    model = Linear_QNet(2, 2, NUM_ACTIONS)
+    policy = InferencePolicy(model)
+    with version.get_lock():
+        model.load_state_dict(shared_model.state_dict())
+        local_version = version.value
+    n_games = 0
+
+    while not stop.is_set():
+        node = game.packet.target_node
+        state = np.array([node.x, node.y])
+        moves = game.possible_actions[node]
+
+        epsilon = max(80 - n_games, 10)
+        if random.randint(0, 200) < epsilon:
+            move = random.randrange(len(moves))
+        else:
+            move = policy(state, game.action_mask(node, NUM_ACTIONS))
+
+        reward, done = game.play_step(moves[move])
+        next_node = game.packet.target_node
+        queue.put(state, move, reward, np.array([next_node.x, next_node.y]), done,
+                  game.action_mask(next_node, NUM_ACTIONS))
+
+        if done:
+            game.reset()
+            n_games += 1
+            if version.value != local_version:
+                with version.get_lock():
+                    model.load_state_dict(shared_model.state_dict())
+                    local_version = version.value
+
+
+def train_actor_learner(num_actors=None, k=4, sync_interval=SYNC_INTERVAL):
+    num_actors = num_actors or max(os.cpu_count() - 1, 1)
+    ctx = mp.get_context('spawn')
+    record = float('-inf')  # best reward so far: rewards are -latency, so the lowest latency
+    total_score = 0
+    agent = Agent(run_name='actor_learner')
+
+    shared_model = Linear_QNet(2, 2, NUM_ACTIONS)
+    shared_model.load_state_dict(agent.model.state_dict())
+    shared_model.share_memory()
+    version = ctx.Value('i', 0)
+    stop = ctx.Event()
+
+    queues = [TransitionQueue(QUEUE_CAPACITY, 2, NUM_ACTIONS, ctx) for _ in range(num_actors)]
+    actors = [ctx.Process(target=run_actor, args=(k, shared_model, version, queue, stop, seed), daemon=True)
+              for seed, queue in enumerate(queues)]
+    for actor in actors:
+        actor.start()
+
+    updates = 0
+    try:
+        while True:
+            finished = []
+            for queue in queues:
+                batch = queue.drain()
+                if batch is None:
+                    continue
+                agent.memory.push_batch(*batch)
+                finished.extend(batch[2][batch[4]])
+
+            if not finished:
+                time.sleep(0.001)
+                continue
+
+            agent.train_long_memory()
+            updates += 1
+            if updates % sync_interval == 0:
+                with version.get_lock():
+                    shared_model.load_state_dict(agent.model.state_dict())
+                    version.value += 1
+
+            for reward in finished:
+                agent.n_games += 1
+                total_score += reward
+                best = reward > record
+                if best:
+                    record = reward
+                agent.checkpoint(best, record=int(record), total_score=int(total_score))
+            print(f'Game {agent.n_games}, Latency: {finished[-1]}, Record: {record}, Mean: {total_score / agent.n_games}')
+    finally:
+        stop.set()
+        for actor in actors:
+            actor.join()
+
+if __name__ == '__main__':
+    train_actor_learner()
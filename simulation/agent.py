@@ -1,46 +1,79 @@
 import torch
 import random
 import numpy as np
-from collections import deque
 from game import Game
-from rlModel import Linear_QNet, QTrainer
-from helper import plot
+from vec_env import VecGame
+from rlModel import Linear_QNet, QTrainer, CheckpointManager, InferencePolicy, MODEL_FOLDER
+from helper import MetricsSink, start_viewer, truncate_records
+from profiler import Profiler
+from replay import ReplayBuffer, PrioritizedReplayBuffer
 import networkx as nx
 from fatTree import dc_topology
+import os
 import time
 
 MAX_MEMORY = 100_000
 BATCH_SIZE = 1000
 LR = 0.001
+NUM_ACTIONS = 4  # Q-network outputs; nodes with fewer neighbours mask the rest
+CHECKPOINT_INTERVAL = 100  # games between periodic checkpoints
+PROFILE_INTERVAL = 100  # games between profiler reports
 
 class Agent:
 
-    def __init__(self):
+    def __init__(self, prioritized=False, state_size=2, hidden_size=2, target_update=None, tau=1.0, run_name='agent'):
         self.n_games = 0
         self.epsilon = 0  # randomness
         self.gamma = 0.9  # discount rate
-        self.memory = deque(maxlen=MAX_MEMORY)  # popleft()
-        self.model = Linear_QNet(2, 2, 4)
-        self.trainer = QTrainer(self.model, lr=LR, gamma=self.gamma)
+        self.prioritized = prioritized  # sample replay by TD error instead of uniformly
+        if prioritized:
+            self.memory = PrioritizedReplayBuffer(MAX_MEMORY, state_size, NUM_ACTIONS)
+        else:
+            self.memory = ReplayBuffer(MAX_MEMORY, state_size, NUM_ACTIONS)
+        self.model = Linear_QNet(state_size, hidden_size, NUM_ACTIONS)
+        self.trainer = QTrainer(self.model, lr=LR, gamma=self.gamma, target_update=target_update, tau=tau)
+        # one checkpoint folder per training setup, so runs with other networks don't mix in
+        self.checkpoints = CheckpointManager(self.model, self.trainer.optimizer, folder=os.path.join(MODEL_FOLDER, run_name))
+        self.policy = InferencePolicy(self.model)
+
+    def resume(self):
+        '''Restores weights, optimizer and game count from the newest checkpoint; returns it (or None)'''
+        checkpoint = self.checkpoints.load()
+        if checkpoint is not None:
+            self.n_games = checkpoint['episode']
+            # a record set after the last periodic checkpoint only made it to best.pth
+            best = self.checkpoints.read('best.pth')
+            if best is not None and 'record' in checkpoint:
+                checkpoint['record'] = max(checkpoint['record'], best['record'])
+            if self.trainer.target_model is not None:
+                self.trainer.sync_target(tau=1)
+        return checkpoint
+
+    def checkpoint(self, best=False, **info):
+        '''Queues a checkpoint every CHECKPOINT_INTERVAL games, and to best.pth on new records'''
+        periodic = self.n_games % CHECKPOINT_INTERVAL == 0
+        if best or periodic:
+            self.checkpoints.save(self.n_games, best=best, periodic=periodic, **info)
 
     def get_state(self, game):
         current_node = game.packet.target_node
         state = current_node
         return current_node, np.array([state.x, state.y])
 
-    def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done))  # popleft if MAX_MEMORY is reached
+    def remember(self, state, action, reward, next_state, done, next_mask):
+        self.memory.push(state, action, reward, next_state, done, next_mask)
 
     def train_long_memory(self):
-        if len(self.memory) > BATCH_SIZE:
-            mini_sample = random.sample(self.memory, BATCH_SIZE)  # list of tuples
+        if self.prioritized:
+            states, actions, rewards, next_states, dones, next_masks, indices, weights = self.memory.sample(BATCH_SIZE)
+            td_errors = self.trainer.train_step(states, actions, rewards, next_states, dones, weights, next_masks)
+            self.memory.update_priorities(indices, td_errors)
         else:
-            mini_sample = self.memory
-        states, actions, rewards, next_states, dones = zip(*mini_sample)
-        self.trainer.train_step(states, actions, rewards, next_states, dones)
+            states, actions, rewards, next_states, dones, next_masks = self.memory.sample(BATCH_SIZE)
+            self.trainer.train_step(states, actions, rewards, next_states, dones, next_mask=next_masks)
 
-    def train_short_memory(self, state, action, reward, next_state, done):
-        self.trainer.train_step(state, action, reward, next_state, done)
+    def train_short_memory(self, state, action, reward, next_state, done, next_mask):
+        self.trainer.train_step(state, action, reward, next_state, done, next_mask=next_mask)
 
     def get_action(self, node, state, game):
     # Increase exploration in the early stages
@@ -52,60 +85,147 @@ class Agent:
         move = random.choice(all_possible_moves)
         final_move = all_possible_moves.index(move)
       else:
-        prediction = self.model(torch.tensor(state, dtype=torch.float))
-        move = torch.argmax(prediction).item()
-        final_move = move
+        # only the node's own neighbours can be picked
+        final_move = self.policy(state, game.action_mask(node, NUM_ACTIONS))
 
       print(f"Action chosen: {final_move}")
       return final_move
-def train():
+
+    def get_actions(self, states, masks):
+        # batched get_action for a VecGame: one forward pass for every episode
+        self.epsilon = max(80 - self.n_games, 10)
+        final_moves = self.policy(states, masks)
+
+        # valid actions are a prefix of each mask, so a random valid one is below its count
+        explore = np.random.randint(0, 201, len(final_moves)) < self.epsilon
+        random_moves = (np.random.rand(len(final_moves)) * masks.sum(axis=1)).astype(np.int64)
+        return np.where(explore, random_moves, final_moves)
+
+def train(render=False, hop=True, live_plot=False, resume=False, profile=False):
     k = 4
     network = nx.Graph()
     dc_topology(network, k)
-    plot_scores = []
-    plot_mean_scores = []
+    profiler = Profiler(enabled=profile, report_every=PROFILE_INTERVAL, path='profile.jsonl')
     total_score = 0
-    record = 1000000
-    agent = Agent()
-    game = Game(network)
+    record = float('-inf')  # best reward so far: rewards are -latency, so the lowest latency
+    agent = Agent(run_name='train')
+    checkpoint = agent.resume() if resume else None
+    if checkpoint is not None:
+        record, total_score = checkpoint['record'], checkpoint['total_score']
+        # continue the score history from the checkpoint; later games are played again
+        truncate_records('scores.jsonl', 'game', agent.n_games)
+    metrics = MetricsSink('scores.jsonl', append=checkpoint is not None)
+    if live_plot:
+        start_viewer(metrics.path)
+    renderer = None
+    if render:
+        from render import Renderer
+        renderer = Renderer()
+    game = Game(network, renderer=renderer, hop=hop, profiler=profiler)
 
     
 
     while True:
         
-        node_old, state_old = agent.get_state(game)
-        final_move = agent.get_action(node_old, state_old, game)
+        with profiler.phase('state'):
+            node_old, state_old = agent.get_state(game)
+        with profiler.phase('action'):
+            final_move = agent.get_action(node_old, state_old, game)
 
-        if node_old.nodeType == 'server':
-            node = game.possible_actions[node_old][0]
-        else:
-            node = game.possible_actions[node_old][final_move]
+        node = game.possible_actions[node_old][final_move]
 
         done=False
         while node_old == game.packet.target_node and not done:
             print(f"Moving packet: Current Node: {node_old}, Target Node: {game.packet.target_node}")
-            reward, done = game.play_step(node)
+            with profiler.phase('env'):
+                reward, done = game.play_step(node)
+            profiler.step()
 
 
-            node_new, state_new = agent.get_state(game)
-            agent.train_short_memory(state_old, final_move, reward, state_new, done)
-            agent.remember(state_old, final_move, reward, state_new, done)
+            with profiler.phase('state'):
+                node_new, state_new = agent.get_state(game)
+                mask_new = game.action_mask(node_new, NUM_ACTIONS)
+            with profiler.phase('short_train'):
+                agent.train_short_memory(state_old, final_move, reward, state_new, done, mask_new)
+            with profiler.phase('remember'):
+                agent.remember(state_old, final_move, reward, state_new, done, mask_new)
 
         if done:
                 game.reset()
                 agent.n_games += 1
+                with profiler.phase('long_train'):
+                    agent.train_long_memory()
+
+                best = reward > record
+                if best:
+                    record = reward
+
+                print(f'Game {agent.n_games}, Latency: {reward}, Record: {record}')
+
+                total_score += reward
+                mean_score = total_score / agent.n_games
+                with profiler.phase('metrics'):
+                    metrics.log(game=agent.n_games, score=int(reward), mean_score=mean_score, record=int(record))
+                with profiler.phase('checkpoint'):
+                    agent.checkpoint(best, record=int(record), total_score=int(total_score))
+                profiler.episode()
+
+def train_vectorized(n_envs=32, features=True, live_plot=False, resume=False, profile=False):
+    k = 4
+    network = nx.Graph()
+    dc_topology(network, k)
+    profiler = Profiler(enabled=profile, report_every=PROFILE_INTERVAL, path='profile.jsonl')
+    total_score = 0
+    record = float('-inf')  # best reward so far: rewards are -latency, so the lowest latency
+    env = VecGame(network, n_envs, NUM_ACTIONS, features=features)
+    # featurized states carry enough structure to be worth a wider hidden layer
+    agent = Agent(state_size=env.state_size, hidden_size=64 if features else 2,
+                  run_name='vectorized_features' if features else 'vectorized')
+    checkpoint = agent.resume() if resume else None
+    if checkpoint is not None:
+        record, total_score = checkpoint['record'], checkpoint['total_score']
+        # continue the score history from the checkpoint; later games are played again
+        truncate_records('scores.jsonl', 'game', agent.n_games)
+    metrics = MetricsSink('scores.jsonl', append=checkpoint is not None)
+    if live_plot:
+        start_viewer(metrics.path)
+    states = env.reset()
+
+    while True:
+        with profiler.phase('action'):
+            actions = agent.get_actions(states, env.action_masks())
+        with profiler.phase('env'):
+            next_states, rewards, dones = env.step(actions)
+            # finished episodes already restarted, but their next mask is never bootstrapped from
+            next_masks = env.action_masks()
+        profiler.step(env.n)
+
+        with profiler.phase('short_train'):
+            agent.train_short_memory(states, actions, rewards, next_states, dones, next_masks)
+        with profiler.phase('remember'):
+            agent.memory.push_batch(states, actions, rewards, next_states, dones, next_masks)
+        with profiler.phase('state'):
+            states = env.observe()
+
+        if dones.any():
+            with profiler.phase('long_train'):
                 agent.train_long_memory()
+            for reward in rewards[dones]:
+                agent.n_games += 1
 
-                if reward < record:
+                best = reward > record
+                if best:
                     record = reward
-                    agent.model.save()
 
                 print(f'Game {agent.n_games}, Latency: {reward}, Record: {record}')
 
-                plot_scores.append(reward)
                 total_score += reward
                 mean_score = total_score / agent.n_games
-                plot_mean_scores.append(mean_score)    
+                with profiler.phase('metrics'):
+                    metrics.log(game=agent.n_games, score=int(reward), mean_score=mean_score, record=int(record))
+                with profiler.phase('checkpoint'):
+                    agent.checkpoint(best, record=int(record), total_score=int(total_score))
+            profiler.episode(int(dones.sum()))
 
 if __name__ == '__main__':
     train()
@@ -0,0 +1,62 @@
+import os
+import time
+import tempfile
+import numpy as np
+import torch
+from rlModel import Linear_QNet, InferencePolicy
+
+BATCH_SIZES = [1, 32, 1024]
+NUM_ACTIONS = 4
+DECISIONS = 20_000
+
+
+def legacy_actions(model, states, masks):
+    # what Agent.get_action did per decision: fresh tensors, autograd on
+    actions = []
+    for state, mask in zip(states, masks):
+        prediction = model(torch.tensor(state, dtype=torch.float))
+        mask = torch.from_numpy(mask)
+        actions.append(torch.argmax(prediction.masked_fill(~mask, float('-inf'))).item())
+    return np.array(actions)
+
+
+def per_decision(f, states, masks, batch_size):
+    '''Mean microseconds per decision when the states arrive batch_size at a time'''
+    start = time.perf_counter()
+    for i in range(0, len(states), batch_size):
+        f(states[i:i + batch_size], masks[i:i + batch_size])
+    return (time.perf_counter() - start) / len(states) * 1e6
+
+
+def main():
+    torch.manual_seed(0)
+    torch.set_num_threads(1)
+    model = Linear_QNet(2, 2, NUM_ACTIONS)
+    states = np.random.rand(DECISIONS, 2).astype(np.float32) * 1000
+    masks = np.arange(NUM_ACTIONS) < np.random.randint(1, NUM_ACTIONS + 1, (DECISIONS, 1))
+
+    policy = InferencePolicy(model, max_batch=max(BATCH_SIZES))
+    with tempfile.TemporaryDirectory() as folder:
+        file_name = os.path.join(folder, 'policy.pt')
+        policy.export(file_name)
+        scripted = torch.jit.load(file_name)
+
+    def run_scripted(s, m):
+        with torch.inference_mode():
+            return scripted(torch.from_numpy(s), torch.from_numpy(m)).numpy()
+
+    expected = legacy_actions(model, states[:1000], masks[:1000])
+    assert np.array_equal(policy(states[:1000], masks[:1000]), expected)
+    assert np.array_equal(run_scripted(states[:1000], masks[:1000]), expected)
+    assert policy(states[0], masks[0]) == expected[0]
+
+    legacy = per_decision(lambda s, m: legacy_actions(model, s, m), states, masks, 1)
+    print(f'legacy get_action      {legacy:8.2f} us/decision')
+    for batch_size in BATCH_SIZES:
+        fast = per_decision(policy, states, masks, batch_size)
+        script = per_decision(run_scripted, states, masks, batch_size)
+        print(f'batch {batch_size:5d}  inference {fast:8.2f} us/decision ({legacy / fast:6.1f}x)'
+              f'  torchscript {script:8.2f} us/decision ({legacy / script:6.1f}x)')
+
+if __name__ == '__main__':
+    main()
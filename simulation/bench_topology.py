@@ -0,0 +1,92 @@
+import time
+import networkx as nx
+from models import Switch, Server, portTableFor
+from fatTree import dc_topology
+
+SIZES = [4, 8, 16, 24, 32, 48, 64]
+LEGACY_MAX_K = 32  # the scan-based builder is slow and its switches only have models.k ports
+
+
+def legacy_dc_topology(network, k2):
+    # the original scan-based builder, kept here as the reference point
+    for dc_id in range(1):
+        servers = []
+        coreSwitches_bdc = [Switch(nodeType='cs', index=index, network=network, DcID=dc_id) for index in
+                            range(int((k2 / 2) ** 2))]
+        aggSwitches_bdc = []
+        edgeSwitches_bdc = []
+
+        for podId in range(k2):
+            for index in range(int(k2 / 2)):
+                aggSwitches_bdc.append(Switch(nodeType='as', pod=podId, index=index, network=network, DcID=dc_id))
+                edgeSwitches_bdc.append(Switch(nodeType='es', pod=podId, index=index, network=network, DcID=dc_id))
+            for index in range(int(k2 / 2) ** 2):
+                servers.append(Server(pod=podId, index=index, network=network, DcID=dc_id))
+
+        network.add_nodes_from(coreSwitches_bdc + aggSwitches_bdc + edgeSwitches_bdc + servers)
+
+        for podId in range(k2):
+            i = 0
+            for aSwitch in [n for n in network.nodes(False) if
+                            (n.nodeType == 'as' and n.pod == podId and n.DcID == dc_id)]:
+                l = 0
+                for j in range(i, int(k2 / 2 + i)):
+                    cSwitch = [n for n in network.nodes(False) if
+                               (n.nodeType == 'cs' and n.index == j and n.DcID == dc_id)]
+                    network.add_edge(aSwitch, cSwitch[0])
+                    l = j
+                i = l + 1
+
+        for podId in range(k2):
+            for eSwitch in [n for n in network.nodes(False) if
+                            (n.nodeType == 'es' and n.pod == podId and n.DcID == dc_id)]:
+                for aSwitch in [n for n in network.nodes(False) if
+                                (n.nodeType == 'as' and n.pod == podId and n.DcID == dc_id)]:
+                    network.add_edge(aSwitch, eSwitch)
+
+                for i in range(0, int(k2 / 2)):
+                    server = [n for n in network.nodes(False) if
+                              (
+                                          n.nodeType == 'server' and n.pod == podId and n.index == i + eSwitch.index * k2 / 2 and n.DcID == dc_id)]
+                    network.add_edge(eSwitch, server[0])
+
+    for edge in network.edges:
+        p1 = [port1 for port1 in edge[0].ports if port1.sendDst == None]
+        p2 = [port2 for port2 in edge[1].ports if port2.sendDst == None]
+        p1[0].sendDst = p2[0]
+        p2[0].sendDst = p1[0]
+
+
+def key(node):
+    return node.nodeType, node.pod, node.index, node.DcID
+
+
+def describe(network):
+    '''Node order, edge order and port-to-port wiring, in comparable form (see test_fatTree.py)'''
+    nodes = [key(n) for n in network.nodes]
+    edges = [(key(u), key(v)) for u, v in network.edges]
+    wiring = [(key(n), port.portID, key(port.sendDst.parent), port.sendDst.portID)
+              for n in network.nodes for port in n.ports if port.sendDst is not None]
+    return nodes, edges, wiring
+
+
+def build_time(builder, k2):
+    network = nx.Graph()
+    start = time.perf_counter()
+    builder(network, k2)
+    return time.perf_counter() - start, network
+
+
+def main():
+    print(f'{"k":>4} {"nodes":>8} {"edges":>8} {"ports":>9} {"port MB":>8} {"legacy (s)":>11} {"indexed (s)":>12}')
+    for k2 in SIZES:
+        seconds, network = build_time(dc_topology, k2)
+        legacy = f'{build_time(legacy_dc_topology, k2)[0]:>11.3f}' if k2 <= LEGACY_MAX_K else f'{"-":>11}'
+        table = portTableFor(network)
+        port_mb = sum(getattr(table, column).nbytes for column in
+                      ('owner', 'portID', 'rate', 'sendavailableBW', 'recavailableBW', 'peer')) / 2 ** 20
+        print(f'{k2:>4} {network.number_of_nodes():>8} {network.number_of_edges():>8} {table.size:>9} {port_mb:>8.1f} {legacy} {seconds:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import time
+import numpy as np
+import torch
+from rlModel import Linear_QNet, QTrainer
+
+BATCH_SIZES = [1, 64, 1000, 10000]
+REPEATS = 5
+
+
+def legacy_train_step(trainer, state, action, reward, next_state, done):
+    # the original per-sample trainer, kept here as the reference point
+    state = torch.tensor(state, dtype=torch.float)
+    next_state = torch.tensor(next_state, dtype=torch.float)
+    action = torch.tensor(action, dtype=torch.long)
+    reward = torch.tensor(reward, dtype=torch.float)
+
+    if len(state.shape) == 1:
+        state = torch.unsqueeze(state, 0)
+        next_state = torch.unsqueeze(next_state, 0)
+        action = torch.unsqueeze(action, 0)
+        reward = torch.unsqueeze(reward, 0)
+        done = (done, )
+
+    pred = trainer.model(state)
+
+    target = pred.clone()
+    for idx in range(len(done)):
+        Q_new = reward[idx]
+        if not done[idx]:
+            Q_new = reward[idx] + trainer.gamma * torch.max(trainer.model(next_state[idx]))
+
+        target[idx][torch.argmax(action[idx]).item()] = Q_new
+
+    trainer.optimizer.zero_grad()
+    loss = trainer.criterion(target, pred)
+    loss.backward()
+
+    trainer.optimizer.step()
+
+
+def make_batch(n, input_size, output_size):
+    states = tuple(np.random.rand(input_size) for _ in range(n))
+    actions = tuple(np.random.randint(0, output_size) for _ in range(n))
+    rewards = tuple(-float(np.random.randint(0, 100)) for _ in range(n))
+    next_states = tuple(np.random.rand(input_size) for _ in range(n))
+    dones = tuple(bool(np.random.rand() < 0.1) for _ in range(n))
+    return states, actions, rewards, next_states, dones
+
+
+def time_step(step, trainer, batch):
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        step(trainer, *batch)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(input_size=2, hidden_size=2, output_size=4):
+    trainer = QTrainer(Linear_QNet(input_size, hidden_size, output_size), lr=0.001, gamma=0.9)
+    print(f'{"batch":>8} {"legacy (ms)":>12} {"batched (ms)":>13} {"speedup":>8}')
+    for n in BATCH_SIZES:
+        batch = make_batch(n, input_size, output_size)
+        legacy = time_step(legacy_train_step, trainer, batch)
+        batched = time_step(QTrainer.train_step, trainer, batch)
+        print(f'{n:>8} {legacy * 1e3:>12.3f} {batched * 1e3:>13.3f} {legacy / batched:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
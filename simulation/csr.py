@@ -0,0 +1,115 @@
+import numpy as np
+import networkx as nx
+from game import Game
+from fatTree import dc_topology
+
+NODE_TYPES = ('cs', 'as', 'es', 'server')  # nodeType codes used in CSRGraph.nodeType
+SERVER = NODE_TYPES.index('server')
+
+
+class CSRGraph(object):
+    '''Integer-id form of a dc_topology fabric with CSR adjacency
+
+    Node i's neighbours are indices[indptr[i]:indptr[i + 1]], in the same
+    order network.neighbors yields them (and so in Game.possible_actions
+    order). nodeType, pod and index are per-node arrays, pod being -1 for
+    core switches; nodes[i] is the original node object.
+    '''
+
+    def __init__(self, nodes, indptr, indices, nodeType, pod, index):
+        self.nodes = nodes
+        self.ids = {node: i for i, node in enumerate(nodes)}
+        self.indptr = indptr
+        self.indices = indices
+        self.nodeType = nodeType
+        self.pod = pod
+        self.index = index
+        self.degree = np.diff(indptr)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def neighbours(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+
+def to_csr(network):
+    nodes = list(network.nodes)
+    ids = {node: i for i, node in enumerate(nodes)}
+
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum([network.degree(node) for node in nodes], out=indptr[1:])
+    indices = np.fromiter((ids[neigh] for node in nodes for neigh in network.neighbors(node)),
+                          dtype=np.int64, count=indptr[-1])
+
+    nodeType = np.array([NODE_TYPES.index(node.nodeType) for node in nodes], dtype=np.int8)
+    pod = np.array([-1 if node.pod is None else node.pod for node in nodes], dtype=np.int64)
+    index = np.array([node.index for node in nodes], dtype=np.int64)
+    return CSRGraph(nodes, indptr, indices, nodeType, pod, index)
+
+
+class CSRGame(object):
+    '''Hop-mode routing game run entirely on CSRGraph arrays
+
+    Nodes and actions are integers: an action is the position of the next
+    node in the current node's neighbour slice, exactly like an index into
+    Game.possible_actions. Link latencies and node positions come from the
+    Game layout and are stored aligned with csr.indices and csr.nodes.
+    '''
+
+    def __init__(self, network):
+        game = Game(network, hop=True)
+        self.csr = to_csr(network)
+        layout = [game.nodes[node] for node in self.csr.nodes]
+        self.positions = np.array([[node.x, node.y] for node in layout], dtype=np.float32)
+        self.latencies = np.array([game.link_latency[(layout[i], layout[j])]
+                                   for i in range(len(layout)) for j in self.csr.neighbours(i)], dtype=np.int64)
+        self.is_server = self.csr.nodeType == SERVER
+        # start where Game.reset puts the packet
+        self.start = self.csr.ids[next(node for node, drawn in game.nodes.items() if drawn is game.packet.target_node)]
+        self.reset()
+
+    def reset(self):
+        self.current = self.start
+        self.latency = 0
+
+    def state(self):
+        return self.positions[self.current]
+
+    def possible_actions(self, node=None):
+        return self.csr.neighbours(self.current if node is None else node)
+
+    def action_mask(self, node, num_actions):
+        # same argument order as Game.action_mask
+        return np.arange(num_actions) < self.csr.degree[node]
+
+    def play_step(self, action):
+        # like indexing Game.possible_actions: an action past the node's neighbours is an error
+        if not 0 <= action < self.csr.degree[self.current]:
+            raise IndexError(f'action {action} out of range for node {self.current} with {self.csr.degree[self.current]} neighbours')
+        edge = self.csr.indptr[self.current] + action
+        self.latency += self.latencies[edge]
+        self.current = self.csr.indices[edge]
+
+        reward, done = 0, False
+        if self.is_server[self.current]:
+            reward = -self.latency
+            done = True
+        return reward, done
+
+
+def main():
+    k = 4
+    network = nx.Graph()
+    dc_topology(network, k)
+
+    csr = to_csr(network)
+    print(len(csr), 'nodes', len(csr.indices), 'adjacency entries')
+    game = CSRGame(network)
+    done = False
+    while not done:
+        reward, done = game.play_step(np.random.randint(len(game.possible_actions())))
+    print('latency', -reward)
+
+if __name__ == '__main__':
+    main()
@@ -1,63 +1,88 @@
+import os
+import pickle
 import networkx as nx
+from collections import OrderedDict
 from models import *
 from itertools import islice
 
 
+class FatTreeIndex(object):
+    '''The index arithmetic of a fat tree built by dc_topology
+
+    Core switches, and servers within a pod, are numbered consecutively in
+    groups of k/2: agg switch i of every pod connects to core switches
+    i*k/2 .. i*k/2 + k/2 - 1, and edge switch i serves the pod's servers
+    i*k/2 .. i*k/2 + k/2 - 1.
+    '''
+
+    def __init__(self, k2):
+        self.k2 = k2
+        self.half = int(k2 / 2)
+
+    def cores_of_agg(self, agg_index):
+        return range(agg_index * self.half, (agg_index + 1) * self.half)
+
+    def agg_of_core(self, core_index):
+        return core_index // self.half
+
+    def servers_of_edge(self, edge_index):
+        return range(edge_index * self.half, (edge_index + 1) * self.half)
+
+    def edge_of_server(self, server_index):
+        return server_index // self.half
+
+    def port_of_server(self, server_index):
+        # position of the server among its edge switch's server links
+        return server_index % self.half
+
+
 def dc_topology(network,k2):
+    addr = FatTreeIndex(k2)
+    half = addr.half
+    numPorts = max(k, k2)  # switches need a port per neighbour, k2 of them at the core
+    # size the shared port table up front: switches, then one port per server
+    portTableFor(network).reserve((half ** 2 + 2 * k2 * half) * numPorts + k2 * half ** 2)
     for dc_id in range(1):
-        servers = []
-        coreSwitches_bdc = [Switch(nodeType='cs', index=index, network=network, DcID=dc_id) for index in
-                            range(int((k2 / 2) ** 2))]
-        aggSwitches_bdc = []
-        edgeSwitches_bdc = []
+        servers = []  # servers[pod * half**2 + index]
+        coreSwitches_bdc = [Switch(nodeType='cs', index=index, network=network, DcID=dc_id, numPorts=numPorts) for index in
+                            range(half ** 2)]
+        aggSwitches_bdc = []  # aggSwitches_bdc[pod * half + index]
+        edgeSwitches_bdc = []  # edgeSwitches_bdc[pod * half + index]
 
         for podId in range(k2):
-            for index in range(int(k2 / 2)):
-                aggSwitches_bdc.append(Switch(nodeType='as', pod=podId, index=index, network=network, DcID=dc_id))
-                edgeSwitches_bdc.append(Switch(nodeType='es', pod=podId, index=index, network=network, DcID=dc_id))
-            for index in range(int(k2 / 2) ** 2):
+            for index in range(half):
+                aggSwitches_bdc.append(Switch(nodeType='as', pod=podId, index=index, network=network, DcID=dc_id, numPorts=numPorts))
+                edgeSwitches_bdc.append(Switch(nodeType='es', pod=podId, index=index, network=network, DcID=dc_id, numPorts=numPorts))
+            for index in range(half ** 2):
                 # if(podId!=0): #only append servers with podid not equal to zero
                 servers.append(Server(pod=podId, index=index, network=network, DcID=dc_id))
 
         # add nodes
         network.add_nodes_from(coreSwitches_bdc + aggSwitches_bdc + edgeSwitches_bdc + servers)
 
-        # add edges
+        # add edges, placing every switch by its pod/index rather than searching for it
+        edges = []
         for podId in range(k2):
-            i = 0
-            for aSwitch in [n for n in network.nodes(False) if
-                            (n.nodeType == 'as' and n.pod == podId and n.DcID == dc_id)]:
-                l = 0
-                for j in range(i, int(k2 / 2 + i)):
-                    # add core to agg
-                    cSwitch = [n for n in network.nodes(False) if
-                               (n.nodeType == 'cs' and n.index == j and n.DcID == dc_id)]
-                    network.add_edge(aSwitch, cSwitch[0])
-                    l = j
-                i = l + 1
+            for index in range(half):
+                aSwitch = aggSwitches_bdc[podId * half + index]
+                edges.extend((aSwitch, coreSwitches_bdc[j]) for j in addr.cores_of_agg(index))
 
         for podId in range(k2):
-            for eSwitch in [n for n in network.nodes(False) if
-                            (n.nodeType == 'es' and n.pod == podId and n.DcID == dc_id)]:
+            for index in range(half):
+                eSwitch = edgeSwitches_bdc[podId * half + index]
                 # add edge to agg
-                for aSwitch in [n for n in network.nodes(False) if
-                                (n.nodeType == 'as' and n.pod == podId and n.DcID == dc_id)]:
-                    network.add_edge(aSwitch, eSwitch)
+                edges.extend((aggSwitches_bdc[podId * half + a], eSwitch) for a in range(half))
+                # add edge to servers
+                edges.extend((eSwitch, servers[podId * half ** 2 + i]) for i in addr.servers_of_edge(index))
 
-                # add edge to servers and for pod 0 add directly to outside edge switch
-
-                for i in range(0, int(k2 / 2)):
-                    server = [n for n in network.nodes(False) if
-                              (
-                                          n.nodeType == 'server' and n.pod == podId and n.index == i + eSwitch.index * k2 / 2 and n.DcID == dc_id)]
-                    network.add_edge(eSwitch, server[0])
+        network.add_edges_from(edges)
 
     # now make port to [port connections between links
     for edge in network.edges:
-        p1 = [port1 for port1 in edge[0].ports if port1.sendDst == None]
-        p2 = [port2 for port2 in edge[1].ports if port2.sendDst == None]
-        p1[0].sendDst = p2[0]
-        p2[0].sendDst = p1[0]
+        p1 = edge[0].takeFreePort()
+        p2 = edge[1].takeFreePort()
+        p1.sendDst = p2
+        p2.sendDst = p1
 
 
 
@@ -65,6 +90,113 @@ def k_shortest_paths(G, source, target, k, weight=None):
   return list(islice(nx.shortest_simple_paths(G, source, target, weight=weight), k))
 
 
+def node_key(node):
+    return node.nodeType, node.pod, node.index, node.DcID
+
+
+class PathCache(object):
+    '''Memoizes k-shortest-path and ECMP path-set queries on a fat tree built by dc_topology
+
+    The topology is static, so answers are kept in an LRU table of at most
+    maxsize (source, target) entries. ECMP sets between servers are written
+    down directly from the pod/index addressing; everything else falls back
+    to networkx once and is then served from the table. k-shortest answers
+    keep their path generator so a later, larger k only computes the extra
+    paths.
+    '''
+
+    def __init__(self, network, k2, maxsize=100_000):
+        self.network = network
+        self.k2 = k2
+        self.addr = FatTreeIndex(k2)
+        self.maxsize = maxsize
+        self.nodes = {node_key(node): node for node in network.nodes}
+        self.entries = OrderedDict()  # key -> [paths, generator or None], least recently used first
+
+    def _get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return entry
+
+    def _node(self, nodeType, pod, index, DcID):
+        return self.nodes[(nodeType, pod, index, DcID)]
+
+    def _server_ecmp(self, source, target):
+        # every shortest server-to-server path in a fat tree has the same shape
+        addr = self.addr
+        half = addr.half
+        dc = source.DcID
+        src_edge = self._node('es', source.pod, addr.edge_of_server(source.index), dc)
+        dst_edge = self._node('es', target.pod, addr.edge_of_server(target.index), dc)
+        if source is target:
+            return [[source]]
+        if src_edge is dst_edge:
+            return [[source, src_edge, target]]
+        if source.pod == target.pod:
+            return [[source, src_edge, self._node('as', source.pod, a, dc), dst_edge, target] for a in range(half)]
+        return [[source, src_edge, self._node('as', source.pod, a, dc), self._node('cs', None, c, dc),
+                 self._node('as', target.pod, a, dc), dst_edge, target]
+                for a in range(half) for c in addr.cores_of_agg(a)]
+
+    def ecmp_paths(self, source, target):
+        '''All equal-cost shortest paths from source to target'''
+        key = ('ecmp', source, target)
+        entry = self._get(key)
+        if entry is None:
+            if source.nodeType == 'server' and target.nodeType == 'server':
+                paths = self._server_ecmp(source, target)
+            else:
+                paths = list(nx.all_shortest_paths(self.network, source, target))
+            entry = self._put(key, [paths, None])
+        return list(entry[0])
+
+    def k_shortest_paths(self, source, target, k, weight=None):
+        '''Same paths as k_shortest_paths(network, source, target, k, weight), up to the order of equal-length ones'''
+        key = ('ksp', source, target, weight)
+        entry = self._get(key)
+        if entry is None:
+            entry = [[], None]
+            if weight is None:
+                # any k of the equal-cost shortest paths are k shortest paths
+                entry[0] = self.ecmp_paths(source, target)
+            entry = self._put(key, entry)
+
+        paths = entry[0]
+        if len(paths) < k:
+            if entry[1] is None:
+                entry[1] = islice(nx.shortest_simple_paths(self.network, source, target, weight=weight), len(paths), None)
+            paths.extend(islice(entry[1], k - len(paths)))
+        return paths[:k]
+
+    def fileName(self, directory='.'):
+        return os.path.join(directory, 'paths_k' + str(self.k2) + '.pkl')
+
+    def save(self, directory='.'):
+        '''Writes the cached path sets to directory/paths_k<k>.pkl, nodes stored by their pod/index key'''
+        table = {}
+        for key, (paths, _) in self.entries.items():
+            table[(key[0], node_key(key[1]), node_key(key[2])) + key[3:]] = [[node_key(n) for n in path] for path in paths]
+        with open(self.fileName(directory), 'wb') as f:
+            pickle.dump(table, f)
+
+    def load(self, directory='.'):
+        '''Fills the cache from a file written by save() for a fabric of the same k'''
+        with open(self.fileName(directory), 'rb') as f:
+            table = pickle.load(f)
+        for key, paths in table.items():
+            # a generator can't be persisted, so ksp entries restart it if more paths are needed
+            self._put((key[0], self.nodes[key[1]], self.nodes[key[2]]) + key[3:],
+                      [[[self.nodes[n] for n in path] for path in paths], None])
+
+
 
 def main():
     k = 4
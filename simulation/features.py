@@ -0,0 +1,82 @@
+import numpy as np
+import networkx as nx
+from csr import to_csr, NODE_TYPES, SERVER
+from fatTree import dc_topology
+from models import portTableFor
+
+NODE_FEATURES = len(NODE_TYPES) + 4  # type one-hot, pod, index, mean and max port load
+DST_FEATURES = 2  # destination pod, index
+
+
+class Featurizer(object):
+    '''Fixed-length state vectors for the routing agent, precomputed per node
+
+    Row i of self.table holds node i's one-hot node type, its pod and index
+    scaled to [0, 1] (core switches have pod 0) and the mean and max send
+    load over its wired ports, read from the fabric's PortTable. The
+    destination block holds the destination server's pod and index and is
+    zero when an episode has no destination. Turning a node into a state
+    is then a single row read; refresh_load() recomputes the load columns
+    for every node at once after bandwidth changes.
+    '''
+
+    def __init__(self, network, csr=None):
+        self.network = network
+        self.csr = csr if csr is not None else to_csr(network)
+        self.size = NODE_FEATURES + DST_FEATURES
+        k2 = int(self.csr.pod.max()) + 1
+        half = k2 // 2
+
+        n = len(self.csr)
+        self.table = np.zeros((n, self.size), dtype=np.float32)
+        self.table[np.arange(n), self.csr.nodeType] = 1
+        self.table[:, len(NODE_TYPES)] = np.maximum(self.csr.pod, 0) / max(k2 - 1, 1)
+        # servers are numbered within their pod, switches within their layer
+        per_type = np.array([half ** 2, half, half, half ** 2])[self.csr.nodeType]
+        self.table[:, len(NODE_TYPES) + 1] = self.csr.index / np.maximum(per_type - 1, 1)
+
+        # the destination block of a server is where that server's own pod and index go
+        self.dst = np.zeros((n, DST_FEATURES), dtype=np.float32)
+        servers = self.csr.nodeType == SERVER
+        self.dst[servers] = self.table[servers, len(NODE_TYPES):len(NODE_TYPES) + 2]
+
+        # PortTable owner id -> csr node id, for the load columns
+        ports = portTableFor(network)
+        self.ports = ports
+        self.owner_ids = np.array([self.csr.ids.get(owner, -1) for owner in ports.owners], dtype=np.int64)
+        self.refresh_load()
+
+    def refresh_load(self):
+        ports = self.ports
+        wired = ports.peer[:ports.size] >= 0
+        nodes = self.owner_ids[ports.owner[:ports.size][wired]]
+        load = 1 - ports.sendavailableBW[:ports.size][wired] / ports.rate[:ports.size][wired]
+
+        n = len(self.csr)
+        count = np.bincount(nodes, minlength=n)
+        mean = np.bincount(nodes, weights=load, minlength=n) / np.maximum(count, 1)
+        peak = np.zeros(n)
+        np.maximum.at(peak, nodes, load)
+        self.table[:, NODE_FEATURES - 2] = mean
+        self.table[:, NODE_FEATURES - 1] = peak
+
+    def encode(self, node, dst=None):
+        '''State vector(s) for csr node id(s) node heading for server id(s) dst'''
+        state = np.take(self.table, node, axis=0)  # a copy, even for a single node
+        if dst is not None:
+            state[..., NODE_FEATURES:] = self.dst[dst]
+        return state
+
+
+def main():
+    k = 4
+    network = nx.Graph()
+    dc_topology(network, k)
+
+    featurizer = Featurizer(network)
+    servers = np.flatnonzero(featurizer.csr.nodeType == SERVER)
+    for node in (0, len(featurizer.csr) - 1):
+        print(featurizer.csr.nodes[node], featurizer.encode(node, servers[-1]))
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,10 @@
-import pygame
+import math
+import numpy as np
 import networkx as nx
 from models import *  # Assuming you have defined the Switch and Server models
 from itertools import islice
 from fatTree import dc_topology  
-
-# Initialize Pygame
-pygame.init()
+from profiler import Profiler
 
 # Constants
 WIDTH, HEIGHT = 1200, 600
@@ -19,9 +18,8 @@ GREEN = (0, 255, 0)
 GRAY = (100, 100, 100)
 YELLOW = (255, 255, 0)
 
-# Initialize the game window
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Data Center Topology Visualization")
+# The environment itself never touches pygame; pass a render.Renderer to
+# Game to draw it (see main below), otherwise it runs headless.
 class Packet:
     def __init__(self, node):
         self.x, self.y = node.x, node.y  # Start packet at the initial node's position
@@ -46,10 +44,26 @@ class Packet:
             self.x, self.y = next_node.x, next_node.y
             self.target_node = next_node
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, RED, (int(self.x), int(self.y)), 5)
-
-# Define Node class for pygame
+    def hop(self, next_node, latency):
+        # jump straight to the next node, charging the latency move() would have accrued
+        self.x, self.y = next_node.x, next_node.y
+        self.target_node = next_node
+        self.latency += latency
+
+
+def link_latency(node1, node2, speed=2):
+    '''Number of Packet.move calls it takes to travel from node1 to node2'''
+    dx = node2.x - node1.x
+    dy = node2.y - node1.y
+    distance = (dx**2 + dy**2) ** 0.5
+    if distance == 0:
+        return 0
+    # move() snaps once both remaining components are under a pixel, i.e. once the
+    # distance left along the line drops below distance / max(|dx|, |dy|)
+    snap = distance / max(abs(dx), abs(dy))
+    return max(0, math.floor((distance - snap) / speed) + 1)
+
+# Define Node class for the layout
 class Node:
     def __init__(self, x, y, color, nodeType):
         self.x = x
@@ -57,28 +71,24 @@ class Node:
         self.color = color
         self.nodeType = nodeType
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, self.color, (self.x, self.y), NODE_RADIUS)
-
-# Define Edge class for pygame
+# Define Edge class for the layout
 class Edge:
     def __init__(self, node1, node2, color=GRAY):
         self.node1 = node1
         self.node2 = node2
         self.color = color
 
-    def draw(self, screen):
-        pygame.draw.aaline(screen, self.color, (self.node1.x, self.node1.y), (self.node2.x, self.node2.y))
-
-# Define Game class to handle the visualization
+# Define Game class to handle the routing environment
 class Game:
-    def __init__(self, network):
+    def __init__(self, network, renderer=None, hop=False, profiler=None):
         self.network = network
         self.nodes = {}
         self.edges = []
         self.possible_actions = {}
-        self.clock = pygame.time.Clock()
-        self.time = pygame.time
+        self.link_latency = {}  # (node, neighbour) -> latency of a full hop
+        self.renderer = renderer  # optional, only attached when visualization is wanted
+        self.hop = hop  # one play_step per hop instead of per pixel
+        self.profiler = profiler or Profiler(enabled=False)
         self.populate_nodes()
         self.packet = Packet(self.nodes[next(node for node in self.nodes if node.nodeType == 'cs')])
         # self.initial()
@@ -137,33 +147,28 @@ class Game:
             neighbours = list(self.network.neighbors(node))
             self.possible_actions[self.nodes[node]] = [self.nodes[neighs] for neighs in neighbours]
 
-    def draw(self, screen):
-        # Redraw background, nodes, and edges to avoid trailing packets
-        screen.fill(WHITE)
+        for node, neighbours in self.possible_actions.items():
+            for neigh in neighbours:
+                self.link_latency[(node, neigh)] = link_latency(node, neigh)
 
-        # Draw edges
-        for edge in self.edges:
-            edge.draw(screen)
-
-        # Draw nodes
-        for node in self.nodes.values():
-            node.draw(screen)
-
-        # Draw packet
-        if self.packet:
-            self.packet.draw(screen)
+    def action_mask(self, node, num_actions):
+        # action i is valid when node has an i-th neighbour
+        return np.arange(num_actions) < len(self.possible_actions[node])
 
     def play_step(self, action):
         # Move the packet
-        self.packet.move(action)
+        if self.hop:
+            self.packet.hop(action, self.link_latency[(self.packet.target_node, action)])
+        else:
+            self.packet.move(action)
 
         # Draw everything
-        self.draw(screen)
-        pygame.display.flip()
-        self.clock.tick(FPS)
+        if self.renderer is not None:
+            with self.profiler.phase('render'):
+                self.renderer.render(self)
 
         reward, done = 0, False
-        if action.nodeType == 'server':
+        if action.nodeType == 'server' and self.packet.target_node is action:
             reward = -self.packet.latency
             done = True
 
@@ -175,16 +180,19 @@ class Game:
             self.play_step(self.nodes[next(node for node in self.nodes if node.nodeType == 'as')])
 
 def main():
+    from render import Renderer
+
     k = 4
     network = nx.Graph()
     dc_topology(network, k)
 
-    game = Game(network)
+    renderer = Renderer()
+    game = Game(network, renderer=renderer)
 
     while True:
         game.play_step(game.nodes[next(node for node in game.nodes if node.nodeType == 'as')])
 
-    pygame.quit()
+    renderer.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
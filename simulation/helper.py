@@ -1,9 +1,19 @@
-import matplotlib.pyplot as plt
-from IPython import display
+import os
+import sys
+import csv
+import json
+import time
+import queue
+import atexit
+import threading
+import subprocess
 
-plt.ion()
 
 def plot(scores, mean_scores):
+    import matplotlib.pyplot as plt
+    from IPython import display
+
+    plt.ion()
     display.clear_output(wait=True)
     display.display(plt.gcf())
     plt.clf()
@@ -16,4 +26,138 @@ def plot(scores, mean_scores):
     plt.text(len(scores)-1, scores[-1], str(scores[-1]))
     plt.text(len(mean_scores)-1, mean_scores[-1], str(mean_scores[-1]))
     plt.show(block=False)
-    plt.pause(.1)
\ No newline at end of file
+    plt.pause(.1)
+
+
+class MetricsSink:
+    '''Collects per-game metrics and appends them to a file from a background thread
+
+    log() only enqueues the record, so the training loop never waits on
+    disk or plotting. Records are written every flush_interval seconds as
+    JSON lines, or as CSV rows when path ends in .csv (columns are taken
+    from the first record). Run view(path) in another process, e.g. via
+    start_viewer, to watch the file live. With append=True records are
+    added to an existing file instead of replacing it, for a resumed run.
+    '''
+
+    def __init__(self, path='scores.jsonl', flush_interval=1.0, append=False):
+        self.path = path
+        self.csv = path.endswith('.csv')
+        self.append = append
+        self.flush_interval = flush_interval
+        self.records = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        # the training loops never return, so write out what is queued when the process exits
+        atexit.register(self.close)
+
+    def log(self, **metrics):
+        self.records.put(metrics)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.records.put(None)
+            self.thread.join()
+
+    def _run(self):
+        with open(self.path, 'a' if self.append else 'w', newline='') as f:
+            writer = None
+            closed = False
+            while not closed:
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                while not closed:
+                    try:
+                        record = self.records.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        closed = True
+                    else:
+                        batch.append(record)
+
+                if self.csv:
+                    if writer is None and batch:
+                        writer = csv.DictWriter(f, fieldnames=list(batch[0]))
+                        if f.tell() == 0:
+                            writer.writeheader()
+                    if batch:
+                        writer.writerows(batch)
+                else:
+                    f.writelines(json.dumps(record) + '\n' for record in batch)
+                f.flush()
+
+
+def truncate_records(path, key, last):
+    '''Drops the records of a metrics file whose key is past last, e.g. games played again after resuming'''
+    if not os.path.exists(path):
+        return
+    with open(path, newline='') as f:
+        lines = [line for line in f if line.endswith('\n')]
+    if path.endswith('.csv'):
+        column = next(csv.reader(lines[:1])).index(key) if lines else None
+        kept = lines[:1] + [line for line in lines[1:] if float(next(csv.reader([line]))[column]) <= last]
+    else:
+        kept = [line for line in lines if json.loads(line)[key] <= last]
+    with open(path, 'w', newline='') as f:
+        f.writelines(kept)
+
+
+def read_records(f, path, header=None):
+    '''Parses the complete lines appended to an open metrics file since the last call'''
+    records = []
+    for line in f.readlines():
+        if not line.endswith('\n'):
+            # half-written line, pick it up again on the next call
+            f.seek(f.tell() - len(line))
+            break
+        if path.endswith('.csv'):
+            values = next(csv.reader([line]))
+            if header is None:
+                header = values
+                continue
+            records.append({key: float(value) for key, value in zip(header, values)})
+        else:
+            records.append(json.loads(line))
+    return records, header
+
+
+def view(path='scores.jsonl', x='game', ys=('score', 'mean_score'), interval=1.0):
+    '''Live plot of a file written by MetricsSink, refreshed every interval seconds'''
+    import matplotlib.pyplot as plt
+
+    while not os.path.exists(path):
+        time.sleep(interval)
+
+    plt.ion()
+    history = {key: [] for key in (x,) + tuple(ys)}
+    header = None
+    with open(path, newline='') as f:
+        while True:
+            records, header = read_records(f, path, header)
+            for record in records:
+                for key in history:
+                    history[key].append(record.get(key))
+            if records:
+                plt.clf()
+                plt.title('Training...')
+                plt.xlabel('Number of Games')
+                plt.ylabel('Score')
+                for y in ys:
+                    plt.plot(history[x], history[y], label=y)
+                plt.legend()
+            plt.pause(interval)
+
+
+def start_viewer(path='scores.jsonl'):
+    '''Runs view(path) in its own process so plotting never touches the training loop
+
+    The viewer is terminated when this process exits.
+    '''
+    viewer = subprocess.Popen([sys.executable, os.path.abspath(__file__), path])
+    atexit.register(viewer.terminate)
+    return viewer
+
+
+if __name__ == '__main__':
+    view(*sys.argv[1:2])
@@ -1,20 +1,27 @@
+import numpy as np
+
 k = 32
 class Switch(object):
     '''Defines a core/aggregate/ToR switch in the DC'''
 
-    def __init__(self, nodeType, pod=None, index=None, network=None, DcID = None):
+    def __init__(self, nodeType, pod=None, index=None, network=None, DcID = None, numPorts=k):
 
         self.nodeType = nodeType
         self.pod = pod
         self.index = index
         self.name = 'switch'
         self.rate =  10000
-        self.ports = []
-        for portID in range(k):
-            self.ports.append(Port(self,portID,self.rate,network))
+        self.ports = portTableFor(network).allocate(self, numPorts, self.rate)
+        self.nextFreePort = 0  # ports are wired in order, so everything from here up is free
         self.network = network
         self.DcID = DcID
 
+    def takeFreePort(self):
+        '''Returns the lowest unwired port and marks it as taken'''
+        port = self.ports[self.nextFreePort]
+        self.nextFreePort += 1
+        return port
+
 
     def __repr__(self):
         return ('' if self.pod == None else str(self.pod) + '.') + self.nodeType + '.' + str(self.index)+ '#'+str(self.DcID)
@@ -27,26 +34,154 @@ class EdgeSwitch(object):
         self.index = index
         self.name = 'switch'
         self.rate = 10000
-        self.ports = []
-        for portID in range(220):
-            self.ports.append(Port(self, portID, self.rate, network))
+        self.ports = portTableFor(network).allocate(self, 220, self.rate)
+        self.nextFreePort = 0
         self.network = network
         self.DcID = DcID
 
+    def takeFreePort(self):
+        '''Returns the lowest unwired port and marks it as taken'''
+        port = self.ports[self.nextFreePort]
+        self.nextFreePort += 1
+        return port
+
     def __repr__(self):
         return ('' if self.pod == None else str(self.pod) + '.') + self.nodeType + '.' + str(self.index) + '#' + str(
             self.DcID)
 
 
-class Port(object):
+class PortTable(object):
+    '''Struct-of-arrays storage for every port of a fabric
 
-    def __init__(self,parent,portid, rate,network):
-        self.portID = portid
-        self.sendavailableBW = rate
-        self.recavailableBW = rate
+    Each row is one port: the id of the node owning it, its port id on that
+    node, its rate, its available send/receive bandwidth and the row of the
+    port it is wired to (-1 when unwired). Nodes get a contiguous block of
+    rows and read them back through lightweight Port views, so bandwidth
+    bookkeeping can be done on whole columns at once.
+    '''
+
+    def __init__(self, network=None, capacity=1024):
         self.network = network
-        self.sendDst = None
-        self.parent = parent
+        self.owners = []  # owner id -> node object
+        self.size = 0
+        self.owner = np.zeros(capacity, dtype=np.int32)
+        self.portID = np.zeros(capacity, dtype=np.int32)
+        self.rate = np.zeros(capacity, dtype=np.float64)
+        self.sendavailableBW = np.zeros(capacity, dtype=np.float64)
+        self.recavailableBW = np.zeros(capacity, dtype=np.float64)
+        self.peer = np.full(capacity, -1, dtype=np.int32)
+
+    def reserve(self, capacity):
+        if capacity <= len(self.owner):
+            return
+        for column in ('owner', 'portID', 'rate', 'sendavailableBW', 'recavailableBW', 'peer'):
+            old = getattr(self, column)
+            new = np.full(capacity, -1 if column == 'peer' else 0, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, column, new)
+
+    def allocate(self, parent, count, rate):
+        '''Appends count ports owned by parent and returns them as a PortList'''
+        if self.size + count > len(self.owner):
+            self.reserve(max(2 * len(self.owner), self.size + count))
+        start = self.size
+        end = start + count
+        self.owner[start:end] = len(self.owners)
+        self.portID[start:end] = np.arange(count)
+        self.rate[start:end] = rate
+        self.sendavailableBW[start:end] = rate
+        self.recavailableBW[start:end] = rate
+        self.owners.append(parent)
+        self.size = end
+        return PortList(self, start, count)
+
+
+def portTableFor(network):
+    '''The PortTable shared by all nodes of network, created on first use'''
+    if network is None:
+        return PortTable()
+    table = network.graph.get('portTable')
+    if table is None:
+        table = network.graph['portTable'] = PortTable(network)
+    return table
+
+
+class PortList(object):
+    '''The block of PortTable rows belonging to one node, indexed like a list'''
+    __slots__ = ('table', 'start', 'count')
+
+    def __init__(self, table, start, count):
+        self.table = table
+        self.start = start
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.count))]
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError('port index out of range')
+        return Port(self.table, self.start + i)
+
+    def __iter__(self):
+        for row in range(self.start, self.start + self.count):
+            yield Port(self.table, row)
+
+
+class Port(object):
+    '''View onto one PortTable row, exposing it with the usual port attributes'''
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __eq__(self, other):
+        return isinstance(other, Port) and self.table is other.table and self.row == other.row
+
+    def __hash__(self):
+        return hash((id(self.table), self.row))
+
+    @property
+    def portID(self):
+        return int(self.table.portID[self.row])
+
+    @property
+    def parent(self):
+        return self.table.owners[self.table.owner[self.row]]
+
+    @property
+    def network(self):
+        return self.table.network
+
+    @property
+    def sendavailableBW(self):
+        return float(self.table.sendavailableBW[self.row])
+
+    @sendavailableBW.setter
+    def sendavailableBW(self, value):
+        self.table.sendavailableBW[self.row] = value
+
+    @property
+    def recavailableBW(self):
+        return float(self.table.recavailableBW[self.row])
+
+    @recavailableBW.setter
+    def recavailableBW(self, value):
+        self.table.recavailableBW[self.row] = value
+
+    @property
+    def sendDst(self):
+        peer = self.table.peer[self.row]
+        return None if peer < 0 else Port(self.table, int(peer))
+
+    @sendDst.setter
+    def sendDst(self, port):
+        self.table.peer[self.row] = -1 if port is None else port.row
 
 class Server:
     def __init__(self, pod=None, index=None, network=None, DcID=None):
@@ -62,7 +197,12 @@ class Server:
         self.name = 'server'
         self.rate = 10000
         self.DcID = DcID
-        self.ports = []
-        for portID in range(1):
-            self.ports.append(Port(self, portID, self.rate, network))
-        self.network = network
\ No newline at end of file
+        self.ports = portTableFor(network).allocate(self, 1, self.rate)
+        self.nextFreePort = 0
+        self.network = network
+
+    def takeFreePort(self):
+        '''Returns the lowest unwired port and marks it as taken'''
+        port = self.ports[self.nextFreePort]
+        self.nextFreePort += 1
+        return port
\ No newline at end of file
@@ -0,0 +1,115 @@
+import json
+import time
+import contextlib
+from collections import defaultdict
+
+_DISABLED = contextlib.nullcontext()
+
+
+class _Timer:
+    __slots__ = ('profiler', 'name', 'start', 'outermost')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        profiler = self.profiler
+        self.outermost = profiler.depth == 0
+        profiler.depth += 1
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        profiler = self.profiler
+        profiler.depth -= 1
+        profiler.totals[self.name] += elapsed
+        profiler.calls[self.name] += 1
+        if self.outermost:
+            profiler.timed += elapsed
+
+
+class Profiler:
+    '''Wall-clock time per training phase plus step and episode counters
+
+    Wrap each phase of the loop in `with profiler.phase(name):`, call
+    step() per environment step and episode() per finished game. Every
+    report_every episodes the window since the last report is printed as
+    steps/s, episodes/s and each phase's share of the elapsed time, and
+    appended as a JSON line to path if one is given. Phases may nest (a
+    nested phase's time also counts towards the enclosing one); 'other' is
+    the time spent outside every phase. A disabled profiler hands out one
+    shared no-op context and returns from the counters straight away.
+    Timers are not reentrant: don't nest a phase in itself.
+    '''
+
+    def __init__(self, enabled=True, report_every=100, path=None):
+        self.enabled = enabled
+        self.report_every = report_every
+        self.path = path
+        self.timers = {}
+        self.reset()
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.steps = 0
+        self.episodes = 0
+        self.depth = 0
+        self.timed = 0.0  # time inside outermost phases
+        self.timers.clear()
+
+    def phase(self, name):
+        if not self.enabled:
+            return _DISABLED
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = _Timer(self, name)
+        return timer
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] += n
+
+    def step(self, n=1):
+        if self.enabled:
+            self.steps += n
+
+    def episode(self, n=1):
+        if not self.enabled:
+            return
+        before = self.episodes // self.report_every
+        self.episodes += n
+        if self.episodes // self.report_every > before:
+            self.report()
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        timed = self.timed
+        phases = {name: {'seconds': seconds, 'share': seconds / elapsed, 'calls': self.calls[name]}
+                  for name, seconds in self.totals.items()}
+        phases['other'] = {'seconds': elapsed - timed, 'share': (elapsed - timed) / elapsed, 'calls': 0}
+        return {
+            'time': time.time(),
+            'elapsed': elapsed,
+            'steps': self.steps,
+            'episodes': self.episodes,
+            'steps_per_s': self.steps / elapsed,
+            'episodes_per_s': self.episodes / elapsed,
+            'phases': phases,
+            'counters': dict(self.counters),
+        }
+
+    def report(self):
+        '''Prints and logs the window since the last report, then starts a new one'''
+        summary = self.summary()
+        breakdown = ', '.join(f"{name} {phase['share']:.0%}"
+                              for name, phase in sorted(summary['phases'].items(), key=lambda item: -item[1]['seconds']))
+        print(f"{summary['steps_per_s']:.0f} steps/s, {summary['episodes_per_s']:.1f} episodes/s | {breakdown}")
+        if self.path is not None:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(summary) + '\n')
+        self.reset()
+        return summary
@@ -0,0 +1,38 @@
+import pygame
+from game import WIDTH, HEIGHT, NODE_RADIUS, FPS, WHITE, RED
+
+
+class Renderer:
+    '''Draws a Game in a pygame window, throttled to FPS frames per second'''
+
+    def __init__(self, fps=FPS):
+        # Initialize Pygame and the game window
+        pygame.init()
+        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("Data Center Topology Visualization")
+        self.clock = pygame.time.Clock()
+        self.fps = fps
+
+    def draw(self, game):
+        # Redraw background, nodes, and edges to avoid trailing packets
+        self.screen.fill(WHITE)
+
+        # Draw edges
+        for edge in game.edges:
+            pygame.draw.aaline(self.screen, edge.color, (edge.node1.x, edge.node1.y), (edge.node2.x, edge.node2.y))
+
+        # Draw nodes
+        for node in game.nodes.values():
+            pygame.draw.circle(self.screen, node.color, (node.x, node.y), NODE_RADIUS)
+
+        # Draw packet
+        if game.packet:
+            pygame.draw.circle(self.screen, RED, (int(game.packet.x), int(game.packet.y)), 5)
+
+    def render(self, game):
+        self.draw(game)
+        pygame.display.flip()
+        self.clock.tick(self.fps)
+
+    def close(self):
+        pygame.quit()
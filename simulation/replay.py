@@ -0,0 +1,159 @@
+import numpy as np
+import torch
+
+
+class ReplayBuffer:
+    '''Fixed-size replay memory backed by preallocated contiguous arrays
+
+    Transitions are written in place into a ring, so inserting is O(1) and
+    sampling is a handful of fancy-index gathers that come back as tensors
+    ready to hand to QTrainer.train_step.
+    '''
+
+    def __init__(self, capacity, state_size, num_actions=None):
+        self.capacity = capacity
+        self.state_size = state_size
+        self.num_actions = num_actions  # when set, valid-action masks of next states are kept too
+        self.states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.bool_)
+        if num_actions is not None:
+            self.next_masks = np.ones((capacity, num_actions), dtype=np.bool_)
+        self.position = 0  # next slot to overwrite
+        self.size = 0
+        self.rng = np.random.default_rng()
+
+    def __len__(self):
+        return self.size
+
+    def push(self, state, action, reward, next_state, done, next_mask=None):
+        i = self.position
+        self.states[i] = state
+        # one-hot moves (snake) are stored by their index
+        self.actions[i] = np.argmax(action) if np.ndim(action) else action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        if next_mask is not None:
+            self.next_masks[i] = next_mask
+        self.position = (i + 1) % self.capacity  # overwrite the oldest once full
+        self.size = min(self.size + 1, self.capacity)
+
+    def push_batch(self, states, actions, rewards, next_states, dones, next_masks=None):
+        # rows from a vectorized environment, written with one slice per field
+        indices = (self.position + np.arange(len(rewards))) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+        self.dones[indices] = dones
+        if next_masks is not None:
+            self.next_masks[indices] = next_masks
+        self.position = (indices[-1] + 1) % self.capacity
+        self.size = min(self.size + len(indices), self.capacity)
+
+    def sample_indices(self, batch_size):
+        # without replacement, like the random.sample over the old deque
+        if self.size > batch_size:
+            return self.rng.choice(self.size, batch_size, replace=False)
+        return np.arange(self.size)
+
+    def gather(self, indices):
+        batch = (torch.from_numpy(self.states[indices]),
+                 torch.from_numpy(self.actions[indices]),
+                 torch.from_numpy(self.rewards[indices]),
+                 torch.from_numpy(self.next_states[indices]),
+                 torch.from_numpy(self.dones[indices]))
+        if self.num_actions is not None:
+            batch += (torch.from_numpy(self.next_masks[indices]),)
+        return batch
+
+    def sample(self, batch_size):
+        return self.gather(self.sample_indices(batch_size))
+
+
+class SumTree:
+    '''Binary sum tree over a fixed number of leaf priorities
+
+    The tree lives in a flat array (node i has children 2i and 2i+1, leaves
+    start at self.leaves), so prefix-sum search and priority updates are
+    O(log n) and both are run for a whole batch at once.
+    '''
+
+    def __init__(self, capacity):
+        self.depth = max(int(np.ceil(np.log2(capacity))), 0)
+        self.leaves = 2 ** self.depth
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64)
+
+    def total(self):
+        return self.tree[1]
+
+    def update(self, indices, priorities):
+        nodes = np.asarray(indices) + self.leaves
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values):
+        # walk down from the root, going right whenever the value is past the left subtree
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            go_right = values > self.tree[left]
+            values -= np.where(go_right, self.tree[left], 0.0)
+            nodes = left + go_right
+        return nodes - self.leaves
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    '''Replay memory sampling transitions in proportion to their TD error
+
+    alpha sets how strongly priorities skew sampling (0 is uniform), beta is
+    the importance-sampling correction, annealed towards 1 by beta_increment
+    on every sample.
+    '''
+
+    def __init__(self, capacity, state_size, num_actions=None, alpha=0.6, beta=0.4, beta_increment=0.001, epsilon=1e-5):
+        super().__init__(capacity, state_size, num_actions)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon
+        self.priorities = SumTree(capacity)
+        self.max_priority = 1.0
+
+    def push(self, state, action, reward, next_state, done, next_mask=None):
+        # new transitions get the largest priority seen so they are replayed at least once
+        self.priorities.update([self.position], [self.max_priority ** self.alpha])
+        super().push(state, action, reward, next_state, done, next_mask)
+
+    def push_batch(self, states, actions, rewards, next_states, dones, next_masks=None):
+        indices = (self.position + np.arange(len(rewards))) % self.capacity
+        self.priorities.update(indices, np.full(len(indices), self.max_priority ** self.alpha))
+        super().push_batch(states, actions, rewards, next_states, dones, next_masks)
+
+    def sample_indices(self, batch_size):
+        # stratified draw: one value from each of batch_size equal slices of the total mass
+        n = min(batch_size, self.size)
+        segment = self.priorities.total() / n
+        values = (np.arange(n) + self.rng.random(n)) * segment
+        return np.minimum(self.priorities.find(values), self.size - 1)
+
+    def sample(self, batch_size):
+        indices = self.sample_indices(batch_size)
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        probs = self.priorities.tree[indices + self.priorities.leaves] / self.priorities.total()
+        weights = (self.size * probs) ** -self.beta
+        weights /= weights.max()
+
+        return self.gather(indices) + (indices, torch.from_numpy(weights.astype(np.float32)))
+
+    def update_priorities(self, indices, td_errors):
+        priorities = np.abs(np.asarray(td_errors, dtype=np.float64)) + self.epsilon
+        self.max_priority = max(self.max_priority, priorities.max())
+        self.priorities.update(indices, priorities ** self.alpha)
@@ -2,7 +2,15 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import torch.nn.functional as F
+import numpy as np
 import os
+import copy
+import glob
+import queue
+import atexit
+import threading
+
+MODEL_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model')
 
 class Linear_QNet(nn.Module):
     def __init__(self, input_size, hidden_size, output_size):
@@ -15,28 +23,219 @@ class Linear_QNet(nn.Module):
         x = self.linear2(x)
         return x
 
+    def sizes(self):
+        return (self.linear1.in_features, self.linear1.out_features, self.linear2.out_features)
+
     def save(self, file_name='model.pth'):
-        model_folder_path = './model'
-        if not os.path.exists(model_folder_path):
-            os.makedirs(model_folder_path)
+        if not os.path.exists(MODEL_FOLDER):
+            os.makedirs(MODEL_FOLDER)
 
-        file_name = os.path.join(model_folder_path, file_name)
+        file_name = os.path.join(MODEL_FOLDER, file_name)
         torch.save(self.state_dict(), file_name)
 
 
+class GreedyPolicy(nn.Module):
+    '''Masked argmax over a Q-network's outputs, scriptable for standalone serving'''
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x, mask):
+        q = self.model(x)
+        return torch.argmax(q.masked_fill(~mask, float('-inf')), dim=1)
+
+
+class InferencePolicy:
+    '''Greedy actions for batches of states without autograd or per-call allocations
+
+    States and masks are copied into input tensors allocated once (grown
+    if a larger batch shows up) and run through GreedyPolicy under
+    torch.inference_mode. The policy shares the model's parameters, so it
+    always acts with the current weights. export() saves the policy as
+    TorchScript, loadable with torch.jit.load without this module.
+    '''
+
+    def __init__(self, model, max_batch=1):
+        self.policy = GreedyPolicy(model)
+        self.input_size = model.linear1.in_features
+        self.num_actions = model.linear2.out_features
+        self._allocate(max_batch)
+
+    def _allocate(self, max_batch):
+        self.states = torch.empty((max_batch, self.input_size))
+        self.masks = torch.ones((max_batch, self.num_actions), dtype=torch.bool)
+
+    def __call__(self, states, masks=None):
+        '''Greedy action index per state row; a single state gives a single int'''
+        states = np.asarray(states)
+        single = states.ndim == 1
+        states = states.reshape(-1, self.input_size)
+        n = len(states)
+        if n > len(self.states):
+            self._allocate(n)
+
+        x = self.states[:n]
+        x.copy_(torch.from_numpy(states))
+        mask = self.masks[:n]
+        if masks is None:
+            mask.fill_(True)
+        else:
+            mask.copy_(torch.from_numpy(np.asarray(masks).reshape(n, self.num_actions)))
+
+        with torch.inference_mode():
+            actions = self.policy(x, mask).numpy()
+        return int(actions[0]) if single else actions
+
+    def export(self, file_name):
+        torch.jit.script(self.policy).save(file_name)
+
+
+def snapshot(state):
+    '''Copy of a (nested) state dict with every tensor cloned, cheaper than copy.deepcopy'''
+    if isinstance(state, torch.Tensor):
+        return state.detach().clone()
+    if isinstance(state, dict):
+        return {key: snapshot(value) for key, value in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot(value) for value in state)
+    return state
+
+
+class CheckpointManager:
+    '''Writes training checkpoints from a background thread
+
+    save() snapshots the model and optimizer state on the calling thread
+    (a copy of a few small tensors) and hands it to a writer thread, which
+    writes it to a temporary file and renames it into place, so a crash
+    mid-write never leaves a truncated checkpoint. Periodic saves go to
+    ckpt_<episode>.pth, of which the last keep are kept; saves made with
+    best=True go to best.pth, and only there unless periodic is also set,
+    so a burst of records can't push the periodic checkpoints out. load()
+    restores the newest periodic checkpoint (or a given one) into the
+    model and optimizer for resuming, after checking it was saved from a
+    network of the same sizes. Runs with different networks need
+    different folders.
+    '''
+
+    def __init__(self, model, optimizer=None, folder=MODEL_FOLDER, keep=3):
+        self.model = model
+        self.optimizer = optimizer
+        self.folder = folder
+        self.keep = keep
+        os.makedirs(folder, exist_ok=True)
+        self.pending = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        # let queued checkpoints land when training is interrupted
+        atexit.register(self.close)
+
+    def save(self, episode, best=False, periodic=True, **info):
+        checkpoint = {
+            'model': snapshot(self.model.state_dict()),
+            'optimizer': snapshot(self.optimizer.state_dict()) if self.optimizer is not None else None,
+            'episode': episode,
+            'sizes': self.model.sizes(),
+            **info,
+        }
+        self.pending.put((checkpoint, best, periodic))
+
+    def checkpoints(self):
+        # zero-padded episode numbers sort in save order
+        return sorted(glob.glob(os.path.join(self.folder, 'ckpt_*.pth')))
+
+    def read(self, file_name):
+        '''Returns the dict saved in file_name without loading it into the model, or None if there is no such file'''
+        file_name = os.path.join(self.folder, file_name)
+        if not os.path.exists(file_name):
+            return None
+        checkpoint = torch.load(file_name, weights_only=False)
+        if tuple(checkpoint.get('sizes', ())) != self.model.sizes():
+            raise ValueError(f"{file_name} holds a {checkpoint.get('sizes')} network, "
+                             f"not {self.model.sizes()} (state, hidden, action sizes)")
+        return checkpoint
+
+    def load(self, file_name=None):
+        '''Loads file_name (default: the newest periodic checkpoint) and returns its dict, or None if there is none'''
+        if file_name is None:
+            checkpoints = self.checkpoints()
+            if not checkpoints:
+                return None
+            file_name = checkpoints[-1]
+        checkpoint = self.read(file_name)
+        if checkpoint is None:
+            return None
+        self.model.load_state_dict(checkpoint['model'])
+        if self.optimizer is not None and checkpoint['optimizer'] is not None:
+            self.optimizer.load_state_dict(checkpoint['optimizer'])
+        return checkpoint
+
+    def close(self):
+        '''Waits for pending writes to finish'''
+        self.pending.put(None)
+        self.thread.join()
+
+    def _write(self, checkpoint, file_name):
+        file_name = os.path.join(self.folder, file_name)
+        tmp = file_name + '.tmp'
+        torch.save(checkpoint, tmp)
+        os.replace(tmp, file_name)
+
+    def _run(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            checkpoint, best, periodic = item
+            if best:
+                self._write(checkpoint, 'best.pth')
+            if periodic:
+                self._write(checkpoint, f"ckpt_{checkpoint['episode']:09d}.pth")
+                for old in self.checkpoints()[:-self.keep]:
+                    os.remove(old)
+
+
 class QTrainer:
-    def __init__(self, model, lr, gamma):
+    '''DQN updates for a Linear_QNet
+
+    With target_update set, Q targets bootstrap from a frozen copy of the
+    model that is synced every target_update train steps: copied outright
+    when tau is 1, otherwise moved a fraction tau of the way towards the
+    online weights (Polyak averaging). Without it, targets come from the
+    model being trained.
+    '''
+
+    def __init__(self, model, lr, gamma, target_update=None, tau=1.0):
         self.lr = lr
         self.gamma = gamma
         self.model = model
         self.optimizer = optim.Adam(model.parameters(), lr=self.lr)
         self.criterion = nn.MSELoss()
+        self.target_update = target_update
+        self.tau = tau
+        self.steps = 0
+        self.target_model = None
+        if target_update is not None:
+            self.target_model = copy.deepcopy(model)
+            self.target_model.requires_grad_(False)
 
-    def train_step(self, state, action, reward, next_state, done):
-        state = torch.tensor(state, dtype=torch.float)
-        next_state = torch.tensor(next_state, dtype=torch.float)
-        action = torch.tensor(action, dtype=torch.long)
-        reward = torch.tensor(reward, dtype=torch.float)
+    def sync_target(self, tau=None):
+        tau = self.tau if tau is None else tau
+        with torch.no_grad():
+            for target, online in zip(self.target_model.parameters(), self.model.parameters()):
+                if tau == 1:
+                    target.copy_(online)
+                else:
+                    target.lerp_(online, tau)
+
+    def train_step(self, state, action, reward, next_state, done, weights=None, next_mask=None):
+        state = torch.as_tensor(np.asarray(state), dtype=torch.float)
+        next_state = torch.as_tensor(np.asarray(next_state), dtype=torch.float)
+        action = torch.as_tensor(np.asarray(action), dtype=torch.long)
+        reward = torch.as_tensor(np.asarray(reward), dtype=torch.float)
+        done = torch.as_tensor(np.asarray(done), dtype=torch.bool)
+        if next_mask is not None:
+            next_mask = torch.as_tensor(np.asarray(next_mask), dtype=torch.bool)
         # (n, x)
 
         if len(state.shape) == 1:
@@ -45,26 +244,43 @@ class QTrainer:
             next_state = torch.unsqueeze(next_state, 0)
             action = torch.unsqueeze(action, 0)
             reward = torch.unsqueeze(reward, 0)
-            done = (done, )
+            done = torch.unsqueeze(done, 0)
+            if next_mask is not None:
+                next_mask = torch.unsqueeze(next_mask, 0)
+
+        # actions come either as one-hot rows (n, n_actions) or as indices (n,)
+        if action.dim() == 2:
+            action = torch.argmax(action, dim=1)
 
         # 1: predicted Q values with current state
         pred = self.model(state)
 
-        target = pred.clone()
-        for idx in range(len(done)):
-            Q_new = reward[idx]
-            if not done[idx]:
-                Q_new = reward[idx] + self.gamma * torch.max(self.model(next_state[idx]))
-
-            target[idx][torch.argmax(action[idx]).item()] = Q_new
-    
         # 2: Q_new = r + y * max(next_predicted Q value) -> only do this if not done
-        # pred.clone()
-        # preds[argmax(action)] = Q_new
+        # all next states go through the network in one batched pass
+        with torch.no_grad():
+            next_pred = (self.model if self.target_model is None else self.target_model)(next_state)
+            if next_mask is not None:
+                # actions the next node doesn't have can't be bootstrapped from
+                next_pred = next_pred.masked_fill(~next_mask, float('-inf'))
+            next_q = torch.max(next_pred, dim=1)[0]
+            Q_new = reward + self.gamma * torch.where(done, torch.zeros_like(next_q), next_q)
+
+        target = pred.detach().clone()
+        target[torch.arange(len(action)), action] = Q_new
+
         self.optimizer.zero_grad()
-        loss = self.criterion(target, pred)
+        if weights is None:
+            loss = self.criterion(target, pred)
+        else:
+            # importance-sampling weights from prioritized replay scale each sample's error
+            weights = torch.as_tensor(weights, dtype=torch.float)
+            loss = (weights * ((target - pred) ** 2).mean(dim=1)).mean()
         loss.backward()
 
         self.optimizer.step()
+        self.steps += 1
+        if self.target_model is not None and self.steps % self.target_update == 0:
+            self.sync_target()
 
-
+        # TD errors of the taken actions, used to refresh replay priorities
+        return (Q_new - pred.detach()[torch.arange(len(action)), action]).numpy()
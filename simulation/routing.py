@@ -0,0 +1,100 @@
+import networkx as nx
+from fatTree import dc_topology, node_key, FatTreeIndex
+from game import Game
+
+
+class EcmpTable(object):
+    '''Closed-form ECMP next-hop tables for a fabric built by dc_topology
+
+    Every switch gets its up-link set (the ECMP candidates towards any
+    destination outside its subtree) and its down-links indexed by the pod
+    or edge index they lead to, both read straight off dc_topology's
+    addressing (see FatTreeIndex). A next-hop lookup is then a couple of
+    comparisons and one dict/list access.
+    '''
+
+    def __init__(self, network, k2):
+        self.network = network
+        self.k2 = k2
+        self.addr = addr = FatTreeIndex(k2)
+        self.nodes = {node_key(node): node for node in network.nodes}
+        self.up = {}  # node -> tuple of ECMP up-links
+        self.down = {}  # switch -> list of down-links by pod (core), edge index (agg) or server index (edge)
+
+        half = addr.half
+        for node in network.nodes:
+            dc = node.DcID
+            if node.nodeType == 'server':
+                self.up[node] = (self.nodes[('es', node.pod, addr.edge_of_server(node.index), dc)],)
+            elif node.nodeType == 'es':
+                self.up[node] = tuple(self.nodes[('as', node.pod, a, dc)] for a in range(half))
+                self.down[node] = [self.nodes[('server', node.pod, i, dc)] for i in addr.servers_of_edge(node.index)]
+            elif node.nodeType == 'as':
+                self.up[node] = tuple(self.nodes[('cs', None, c, dc)] for c in addr.cores_of_agg(node.index))
+                self.down[node] = [self.nodes[('es', node.pod, e, dc)] for e in range(half)]
+            else:
+                self.up[node] = ()
+                self.down[node] = [self.nodes[('as', pod, addr.agg_of_core(node.index), dc)] for pod in range(k2)]
+
+    def next_hops(self, node, dst):
+        '''ECMP candidates for the next hop from node towards server dst'''
+        addr = self.addr
+        if node is dst:
+            return ()
+        if node.nodeType == 'cs':
+            return (self.down[node][dst.pod],)
+        if node.nodeType == 'as' and node.pod == dst.pod:
+            return (self.down[node][addr.edge_of_server(dst.index)],)
+        if node.nodeType == 'es' and node.pod == dst.pod and node.index == addr.edge_of_server(dst.index):
+            return (self.down[node][addr.port_of_server(dst.index)],)
+        return self.up[node]
+
+    def next_hop(self, node, dst, flow_hash=0):
+        '''Deterministic ECMP choice: candidates are picked by flow_hash'''
+        hops = self.next_hops(node, dst)
+        return hops[flow_hash % len(hops)]
+
+    def route(self, src, dst, flow_hash=0):
+        '''The baseline path a flow takes from src to server dst'''
+        path = [src]
+        while path[-1] is not dst:
+            path.append(self.next_hop(path[-1], dst, flow_hash))
+        return path
+
+    def hops_to(self, node, dst):
+        '''Number of hops left on a shortest path from node to server dst'''
+        if node is dst:
+            return 0
+        level = {'server': 0, 'es': 1, 'as': 2, 'cs': 3}[node.nodeType]
+        dst_edge = self.addr.edge_of_server(dst.index)
+        same_edge = node.pod == dst.pod and (node.nodeType == 'server' and self.addr.edge_of_server(node.index) == dst_edge
+                                             or node.nodeType == 'es' and node.index == dst_edge)
+        if same_edge:
+            return 2 - level
+        if node.pod == dst.pod:
+            # up to an agg switch of the shared pod and back down
+            return 4 - level
+        # up to a core switch and back down
+        return 6 - level
+
+
+def route_latency(game, table, src, dst, flow_hash=0):
+    '''Latency the routing Game charges for the baseline route from src to dst'''
+    path = [game.nodes[node] for node in table.route(src, dst, flow_hash)]
+    return sum(game.link_latency[(a, b)] for a, b in zip(path, path[1:]))
+
+
+def main():
+    k = 4
+    network = nx.Graph()
+    dc_topology(network, k)
+    table = EcmpTable(network, k)
+
+    game = Game(network, hop=True)
+    servers = [n for n in network.nodes if n.nodeType == 'server']
+    for flow_hash in range(3):
+        path = table.route(servers[0], servers[-1], flow_hash)
+        print(path[1:-1], 'latency', route_latency(game, table, servers[0], servers[-1], flow_hash))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+import networkx as nx
+import pytest
+from fatTree import dc_topology
+from bench_topology import legacy_dc_topology, describe
+
+
+@pytest.mark.parametrize('k2', [4, 8])
+def test_dc_topology_matches_legacy_builder(k2):
+    # same nodes, edges and port-to-port wiring, in the same order, as the original scan-based builder
+    legacy, network = nx.Graph(), nx.Graph()
+    legacy_dc_topology(legacy, k2)
+    dc_topology(network, k2)
+    assert describe(network) == describe(legacy)
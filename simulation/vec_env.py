@@ -0,0 +1,92 @@
+import numpy as np
+import networkx as nx
+from csr import CSRGame
+from features import Featurizer
+from fatTree import dc_topology
+
+
+class VecGame:
+    '''Steps n independent routing episodes over one fat tree in lockstep
+
+    Built on the CSRGame arrays (integer node ids, CSR adjacency and
+    per-link latencies), so one step for all packets is a few array
+    lookups. Observations, actions, rewards and done flags are arrays with
+    one row per episode; finished episodes restart from the core switch
+    Game.reset uses. With features=True observations are Featurizer rows
+    instead of the packet's (x, y) position.
+    '''
+
+    def __init__(self, network, n, num_actions=None, features=False):
+        self.n = n
+        self.game = CSRGame(network)
+        self.csr = self.game.csr
+        self.state_table = self.game.positions  # node id -> observation
+        if features:
+            self.state_table = Featurizer(network, self.csr).table
+        self.state_size = self.state_table.shape[1]
+        self.latencies = self.game.latencies
+        self.degree = self.csr.degree
+        self.is_server = self.game.is_server
+        # valid-action mask of every node, padded to the model's action count
+        num_actions = num_actions or self.degree.max()
+        self.masks = np.arange(num_actions) < self.degree[:, None]
+
+        self.start = self.game.start
+        self.current = np.full(n, self.start, dtype=np.int64)
+        self.latency = np.zeros(n, dtype=np.int64)
+
+    def reset(self):
+        self.current[:] = self.start
+        self.latency[:] = 0
+        return self.observe()
+
+    def observe(self):
+        # one state row per episode, (x, y) like Agent.get_state unless features are on
+        return self.state_table[self.current]
+
+    def num_actions(self):
+        return self.degree[self.current]
+
+    def action_masks(self):
+        return self.masks[self.current]
+
+    def step(self, actions):
+        '''Apply one hop per episode and return (next_states, rewards, dones)
+
+        next_states are the states the actions led to (terminal ones for
+        finished episodes); those episodes are reset afterwards, so the next
+        observe() already starts them over.
+        '''
+        # like CSRGame.play_step: a move outside the action mask is an error, not a neighbour of another node
+        actions = np.asarray(actions)
+        invalid = (actions < 0) | (actions >= self.degree[self.current])
+        if invalid.any():
+            i = np.flatnonzero(invalid)[0]
+            raise IndexError(f'action {actions[i]} out of range for node {self.current[i]} with '
+                             f'{self.degree[self.current[i]]} neighbours (episode {i})')
+        edges = self.csr.indptr[self.current] + actions
+        self.latency += self.latencies[edges]
+        self.current = self.csr.indices[edges]
+
+        next_states = self.state_table[self.current]
+        dones = self.is_server[self.current]
+        rewards = np.where(dones, -self.latency, 0)
+
+        self.current[dones] = self.start
+        self.latency[dones] = 0
+        return next_states, rewards, dones
+
+
+def main():
+    k = 4
+    network = nx.Graph()
+    dc_topology(network, k)
+
+    env = VecGame(network, 8)
+    env.reset()
+    for _ in range(10):
+        next_states, rewards, dones = env.step((np.random.rand(env.n) * env.num_actions()).astype(np.int64))
+        print(rewards, dones)
+
+if __name__ == '__main__':
+    main()
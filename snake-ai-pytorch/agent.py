@@ -1,10 +1,17 @@
+import os
+import sys
 import torch
 import random
 import numpy as np
-from collections import deque
 from game import SnakeGameAI, Direction, Point
 from model import Linear_QNet, QTrainer
-from helper import plot
+
+# the replay buffer, greedy policy and metrics sink are shared with the routing agent in ../simulation;
+# appended so this project's own game and model modules still win
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'simulation'))
+from rlModel import InferencePolicy
+from helper import MetricsSink, start_viewer
+from replay import ReplayBuffer
 
 MAX_MEMORY = 100_000
 BATCH_SIZE = 1000
@@ -16,9 +23,10 @@ class Agent:
         self.n_games = 0
         self.epsilon = 0 # randomness
         self.gamma = 0.9 # discount rate
-        self.memory = deque(maxlen=MAX_MEMORY) # popleft()
+        self.memory = ReplayBuffer(MAX_MEMORY, 11)
         self.model = Linear_QNet(11, 256, 3)
         self.trainer = QTrainer(self.model, lr=LR, gamma=self.gamma)
+        self.policy = InferencePolicy(self.model)
 
 
     def get_state(self, game):
@@ -68,18 +76,11 @@ class Agent:
         return np.array(state, dtype=int)
 
     def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done)) # popleft if MAX_MEMORY is reached
+        self.memory.push(state, action, reward, next_state, done)
 
     def train_long_memory(self):
-        if len(self.memory) > BATCH_SIZE:
-            mini_sample = random.sample(self.memory, BATCH_SIZE) # list of tuples
-        else:
-            mini_sample = self.memory
-
-        states, actions, rewards, next_states, dones = zip(*mini_sample)
+        states, actions, rewards, next_states, dones = self.memory.sample(BATCH_SIZE)
         self.trainer.train_step(states, actions, rewards, next_states, dones)
-        #for state, action, reward, nexrt_state, done in mini_sample:
-        #    self.trainer.train_step(state, action, reward, next_state, done)
 
     def train_short_memory(self, state, action, reward, next_state, done):
         self.trainer.train_step(state, action, reward, next_state, done)
@@ -92,17 +93,16 @@ class Agent:
             move = random.randint(0, 2)
             final_move[move] = 1
         else:
-            state0 = torch.tensor(state, dtype=torch.float)
-            prediction = self.model(state0)
-            move = torch.argmax(prediction).item()
+            move = self.policy(state)
             final_move[move] = 1
 
         return final_move
 
 
-def train():
-    plot_scores = []
-    plot_mean_scores = []
+def train(live_plot=False):
+    metrics = MetricsSink('scores.jsonl')
+    if live_plot:
+        start_viewer(metrics.path)
     total_score = 0
     record = 0
     agent = Agent()
@@ -125,7 +125,7 @@ def train():
         agent.remember(state_old, final_move, reward, state_new, done)
 
         if done:
-            # train long memory, plot result
+            # train long memory, log result
             game.reset()
             agent.n_games += 1
             agent.train_long_memory()
@@ -136,11 +136,9 @@ def train():
 
             print('Game', agent.n_games, 'Score', score, 'Record:', record)
 
-            plot_scores.append(score)
             total_score += score
             mean_score = total_score / agent.n_games
-            plot_mean_scores.append(mean_score)
-            plot(plot_scores, plot_mean_scores)
+            metrics.log(game=agent.n_games, score=score, mean_score=mean_score, record=record)
 
 
 if __name__ == '__main__':